@@ -0,0 +1,135 @@
+"""Micro-benchmarks for ``mousestyles.intervals.Intervals``.
+
+Times the normalization of overlapping intervals (``_make_disjoint``)
+against the legacy while-loop implementation.  The inputs are the real
+AS and IS intervals of all mouse-days, either pooled as they are (every
+day is timed from midnight, so they overlap heavily and merge into few
+intervals) or laid end to end, one day after the other, so that nothing
+merges and the size of the output grows with the input.
+
+Also times the merge-based intersection of the F and W intervals with AS
+over every mouse-day against the legacy complement-based ``~(~AS + ~F)``,
+and the same intersection and ``ASs`` done on all mouse-days at once
+with ``IntervalsArray`` against a loop over per-day ``Intervals``.
+
+Run from the repository root:
+
+    python benchmarks/bench_intervals.py
+"""
+from __future__ import print_function, absolute_import, division
+
+import timeit
+
+import numpy as np
+
+from mousestyles.data import load_intervals, load_intervals_index
+from mousestyles.intervals import Intervals, IntervalsArray
+
+
+def legacy_make_disjoint(intervals):
+    """ The while-loop / np.vstack merge used before vectorization """
+    good_intervals_idx = intervals[:, 1] >= intervals[:, 0]
+    intervals = intervals[good_intervals_idx, :]
+    tot = None
+    curr_idx = 0
+    curr_lhs = intervals[curr_idx, 0]
+    curr_rhs = intervals[curr_idx, 1]
+    while curr_idx < intervals.shape[0]:
+        while curr_rhs >= intervals[curr_idx, 0]:
+            curr_rhs = max(curr_rhs, intervals[curr_idx, 1])
+            curr_idx += 1
+            if curr_idx >= intervals.shape[0]:
+                break
+        if tot is None:
+            tot = np.array([curr_lhs, curr_rhs])
+        else:
+            tot = np.vstack((tot, np.array([curr_lhs, curr_rhs])))
+        if curr_idx < intervals.shape[0]:
+            curr_lhs = intervals[curr_idx, 0]
+            curr_rhs = intervals[curr_idx, 1]
+    return np.atleast_2d(tot)
+
+
+def vectorized_make_disjoint(intervals):
+    F = Intervals()
+    F.intervals = intervals
+    F._make_disjoint()
+    return F.intervals
+
+
+def bench_make_disjoint(features=("AS", "IS"), sizes=(100, 300, 1000),
+                        repeat=5):
+    print("_make_disjoint")
+    for feature in features:
+        index = load_intervals_index(feature)
+        pooled = index.values
+        # one day-long slot per mouse-day
+        day = np.repeat(np.arange(len(index)), index.stops - index.starts)
+        serial = pooled + 1e6 * day[:, None]
+        for layout, data in (("pooled", pooled), ("serial", serial)):
+            for n in sizes + (data.shape[0],):
+                ivt = data[:n]
+                ivt = ivt[ivt[:, 0].argsort()]
+                run_make_disjoint(feature, layout, ivt, repeat)
+
+
+def run_make_disjoint(feature, layout, ivt, repeat):
+    np.testing.assert_array_equal(legacy_make_disjoint(ivt),
+                                  vectorized_make_disjoint(ivt))
+    t_old = min(timeit.repeat(lambda: legacy_make_disjoint(ivt),
+                              number=1, repeat=repeat))
+    t_new = min(timeit.repeat(lambda: vectorized_make_disjoint(ivt),
+                              number=1, repeat=repeat))
+    print("%-4s %-6s %5d intervals  legacy %8.3f ms  vectorized %6.3f ms"
+          "  speedup %6.1fx" % (feature, layout, ivt.shape[0], 1e3 * t_old,
+                                1e3 * t_new, t_old / t_new))
+
+
+def bench_intersect(features=("F", "W"), repeat=3):
+    print("intersect with AS, all mouse-days")
+    AS = load_intervals_index("AS")
+    days = [tuple(key) for key in AS.keys]
+    for feature in features:
+        index = load_intervals_index(feature)
+        pairs = [(Intervals(AS.get(*key)), Intervals(index.get(*key)))
+                 for key in days]
+        for A, B in pairs:
+            np.testing.assert_array_equal(A.intersect(B).intervals,
+                                          (~(~A + ~B)).intervals)
+        t_old = min(timeit.repeat(
+            lambda: [~(~A + ~B) for A, B in pairs], number=1, repeat=repeat))
+        t_new = min(timeit.repeat(
+            lambda: [A.intersect(B) for A, B in pairs], number=1,
+            repeat=repeat))
+        print("AS * %-2s %4d days  legacy %8.1f ms  merge %7.1f ms"
+              "  speedup %5.1fx" % (feature, len(days), 1e3 * t_old,
+                                    1e3 * t_new, t_old / t_new))
+
+
+def bench_intervals_array(features=("F", "W"), repeat=3):
+    print("IntervalsArray, all mouse-days")
+    AS = IntervalsArray.from_frame(load_intervals("AS"))
+    singles = AS.to_list()
+    for feature in features:
+        F = IntervalsArray.from_frame(load_intervals(feature))
+        assert np.array_equal(F.keys, AS.keys)
+        pairs = list(zip(singles, F.to_list()))
+        t_loop = min(timeit.repeat(
+            lambda: [A.intersect(B) for A, B in pairs], number=1,
+            repeat=repeat))
+        t_array = min(timeit.repeat(lambda: AS * F, number=1,
+                                    repeat=repeat))
+        print("AS * %-2s   loop %8.1f ms  array %7.1f ms  speedup %5.1fx" %
+              (feature, 1e3 * t_loop, 1e3 * t_array, t_loop / t_array))
+    t_loop = min(timeit.repeat(lambda: [A.ASs(20) for A in singles],
+                               number=1, repeat=repeat))
+    t_array = min(timeit.repeat(lambda: AS.ASs(20), number=1,
+                                repeat=repeat))
+    print("AS.ASs   loop %8.1f ms  array %7.1f ms  speedup %5.1fx" %
+          (1e3 * t_loop, 1e3 * t_array, t_loop / t_array))
+
+
+if __name__ == "__main__":
+    bench_make_disjoint()
+    bench_intersect()
+    bench_intervals_array()
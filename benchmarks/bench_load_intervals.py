@@ -0,0 +1,62 @@
+"""Benchmark the bulk interval loader against the legacy concat loop.
+
+The legacy loader grew its table with ``pd.concat`` once per file, which
+is quadratic in the number of rows.  Both loaders read straight from
+disk, bypassing ``mousestyles.data.intervals_cache``.
+
+Run from the repository root:
+
+    python benchmarks/bench_load_intervals.py
+"""
+from __future__ import print_function, absolute_import, division
+
+import os
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from mousestyles import data_dir
+from mousestyles.data import _read_intervals
+
+
+def legacy_read_intervals(feature):
+    """ The per-file ``pd.concat`` loader used before the bulk loader """
+    file_names = os.listdir(os.path.join(data_dir, "intervals", feature))
+    dt = pd.DataFrame()
+    for item in file_names:
+        strain = int(item.split("strain")[1].split("_mouse")[0])
+        mouse = int(item.split("mouse")[1].split("_day")[0])
+        day = int(item.split("day")[1].split(".npy")[0])
+        path = os.path.join(data_dir, "intervals", feature, item)
+        sub = np.load(path)
+        dt_sub = pd.DataFrame()
+        dt_sub["strain"] = [strain] * sub.shape[0]
+        dt_sub["mouse"] = [mouse] * sub.shape[0]
+        dt_sub["day"] = [day] * sub.shape[0]
+        dt_sub["start"] = sub[:, 0]
+        dt_sub["stop"] = sub[:, 1]
+        dt = pd.concat([dt, dt_sub])
+    # DataFrame.sort was renamed sort_values in pandas 0.17
+    sort = getattr(dt, "sort_values", None) or dt.sort
+    dt = sort(["strain", "mouse", "day"], kind="mergesort")
+    dt.index = range(dt.shape[0])
+    return dt
+
+
+def main(features=("AS", "IS"), repeat=5):
+    for feature in features:
+        old = legacy_read_intervals(feature)
+        new = _read_intervals(feature)
+        assert np.all(old.values == new.values)
+        t_old = min(timeit.repeat(lambda: legacy_read_intervals(feature),
+                                  number=1, repeat=repeat))
+        t_new = min(timeit.repeat(lambda: _read_intervals(feature),
+                                  number=1, repeat=repeat))
+        print("%-4s %8d rows  legacy %8.2f ms  bulk %8.2f ms  speedup %5.1fx"
+              % (feature, new.shape[0], 1e3 * t_old, 1e3 * t_new,
+                 t_old / t_new))
+
+
+if __name__ == "__main__":
+    main()
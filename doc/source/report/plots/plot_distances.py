@@ -1,6 +1,6 @@
 import matplotlib.pyplot as plt
 
-from mousestyles.data import distances_bystrain
+from mousestyles.data import distances_bystrain, list_mousedays
 
 
 threshold = 0.1
@@ -9,25 +9,25 @@ xlim = [0, 40]
 col = 'blue'
 verbose = False
 step = 50
+# number of processes, None uses every core
+workers = None
 
 plt.style.use('ggplot')
 plt.style.use('seaborn-notebook')
 
 # Extract strain data
 dist_strain = []
-strain = 0
-dist = distances_bystrain(strain, step=step)
-while dist.size > 0:
+strains = sorted(set(key[0] for key in list_mousedays()))
+for strain in strains:
+    dist = distances_bystrain(strain, step=step, workers=workers)
     dist_strain.append(dist[dist >= threshold])
     if verbose:
         print('strain %s loaded.' % strain)
-    strain += 1
-    dist = distances_bystrain(strain, step=step)
 
 # Plot
 fig = plt.figure(1)
 fig.subplots_adjust(hspace=.6)
-nb_plots = strain
+nb_plots = len(strains)
 for i, s in enumerate(dist_strain):
     index_plot = nb_plots * 100 + 10 + i + 1
     plt.subplot(index_plot)
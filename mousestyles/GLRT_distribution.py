@@ -124,10 +124,7 @@ def hypo_powerLaw_null(strain, mouse, day, law_est=0, seed=-1):
     """
     if seed != -1:
         np.random.seed(seed)
-    df = data.load_movement(strain, mouse, day)
-    xcood = df["x"]
-    ycood = df["y"]
-    distance_vector = np.sqrt(np.diff(xcood)**2 + np.diff(ycood)**2)
+    distance_vector = data.MouseDay(strain, mouse, day)["dist"]
     msk = distance_vector > 1
     cut_dist = distance_vector[msk]
     if law_est == 0:
@@ -203,10 +200,7 @@ def hypo_exp_null(strain, mouse, day, law_est=0, exp_est=0, seed=-1):
     """
     if seed != -1:
         np.random.seed(seed)
-    df = data.load_movement(strain, mouse, day)
-    xcood = df["x"]
-    ycood = df["y"]
-    distance_vector = np.sqrt(np.diff(xcood)**2 + np.diff(ycood)**2)
+    distance_vector = data.MouseDay(strain, mouse, day)["dist"]
     msk = distance_vector > 1
     cut_dist = distance_vector[msk]
     if law_est == 0:
@@ -7,12 +7,27 @@ import pandas as pd
 
 from mousestyles import data_dir
 from mousestyles.intervals import Intervals
+from mousestyles.data import store as _store
+from mousestyles.data.cache import LRUCache
+from mousestyles.data.catalog import build_catalog, get_catalog  # noqa
+from mousestyles.data.index import MouseDayIndex
+from mousestyles.data.mouseday import MouseDay, _check_mouseday
+from mousestyles.data.derived import open_derived, precompute_derived  # noqa
+from mousestyles.data.features import FeatureTensor
+from mousestyles.data.store import pack_movement  # noqa
 import collections
+import multiprocessing
 
 from matplotlib.externals import six
 
 INTERVAL_FEATURES = ["AS", "F", "IS", "M_AS", "M_IS", "W"]
 
+# interval tables loaded by ``load_intervals``, shared by the whole process;
+# use ``intervals_cache.info()`` for hit and miss counts,
+# ``intervals_cache.invalidate()`` after the files on disk change and
+# ``intervals_cache.resize(max_bytes)`` to change the size limit
+intervals_cache = LRUCache(max_bytes=2 ** 30)
+
 
 def load_all_features():
     """
@@ -27,6 +42,9 @@ def load_all_features():
 
     The remaining 9 columns are the computed features.
 
+    The frame is built once per process from the memory-mapped features
+    file; each call returns a copy of it.
+
     Returns
     -------
     features_data_frame : pandas.DataFrame
@@ -43,31 +61,48 @@ def load_all_features():
         'ASWaterIntensity',
         'MoveASIntensity']
 
-    # 9 x 1921 x (3 labels + 11 feature time bins)
-    all_features = np.load(
-        _os.path.join(
-            data_dir,
-            'all_features_mousedays_11bins.npy'))
-
-    # Here we begin reshaping the 3-d numpy array into a pandas 2-d dataframe
-    columns = ['strain', 'mouse', 'day']
-    # Append 2-hour time bin values
-    columns += list(range(0, 22, 2))
-
-    # For each feature, unpivot its dataframe so that the 2-hour
-    # time bins become a value column, rather than a dimension
-    data_frames = []
-    for (i, feature) in enumerate(features):
-        df = pd.DataFrame(data=all_features[i, :, :], columns=columns)
-        melted_df = pd.melt(df, id_vars=columns[:3], value_vars=columns[3:],
-                            var_name='hour', value_name=feature)
-        data_frames.append(melted_df)
-
-    # Connect each of the feature dataframes to make one dataframe
-    all_features_df = data_frames.pop(0)
-    other_features = [x.iloc[:, -1] for x in data_frames]
-    other_features.insert(0, all_features_df)
-    return pd.concat(other_features, axis=1)
+    global _all_features_frame
+    if _all_features_frame is None:
+        _all_features_frame = _melt_features(_features_array(), features)
+    return _all_features_frame.copy()
+
+
+def _melt_features(all_features, features):
+    """
+    Long-format frame of the 9 x 1921 x (3 labels + 11 feature time bins)
+    array, see ``load_all_features``.
+    """
+    num_days, num_bins = all_features.shape[1], all_features.shape[2] - 3
+    # Unpivot the 2-hour time bins into rows: row h * 1921 + i holds
+    # the time bin h of mouse-day i, as pd.melt orders them, and a single
+    # transpose gives the (bin, mouse-day, feature) order of the values
+    block = np.empty((num_bins * num_days, 3 + len(features)))
+    block[:, :3] = np.tile(all_features[0, :, :3], (num_bins, 1))
+    block[:, 3:] = all_features[:, :, 3:].transpose(2, 1, 0).reshape(
+        num_bins * num_days, len(features))
+    df = pd.DataFrame(block, columns=['strain', 'mouse', 'day'] + features)
+    # the time bins are column labels in the 3-d array, so they come out
+    # as python integers
+    hours = np.empty(num_bins * num_days, dtype=object)
+    hours[:] = np.repeat(list(range(0, 2 * num_bins, 2)), num_days).tolist()
+    df.insert(3, 'hour', hours)
+    return df
+
+
+def _features_array():
+    """
+    The (9, 1921, 14) array of ``all_features_mousedays_11bins.npy``,
+    memory-mapped read-only on first use and shared by later calls.
+    """
+    global _all_features
+    if _all_features is None:
+        _all_features = np.load(_os.path.join(
+            data_dir, 'all_features_mousedays_11bins.npy'), mmap_mode='r')
+    return _all_features
+
+
+_all_features = None
+_all_features_frame = None
 
 
 def load_mouseday_features(features=None):
@@ -138,28 +173,34 @@ def load_mouseday_features(features=None):
                 "Input value must be chosen from " + fea_str + "."
             )
 
-    # 9 x 1921 x (3 labels + 11 feature time bins)
-    all_features = np.load(
-        _os.path.join(
-            data_dir,
-            "all_features_mousedays_11bins.npy"))
-
-    # Locate each feature and aggregate numpy arrays
-    dic = {}
-    for (i, feature) in enumerate(features_list):
-        dic[feature] = i
-    all_data_orig = np.hstack(
-        [all_features[0, :, 0:3]] +
-        [all_features[dic[feature], :, 3:] for feature in features])
-
-    # Prepare column names
-    columns = ["strain", "mouse", "day"]
-    for feature in features:
-        columns += [feature + "_" + str(x) for x in range(0, 22, 2)]
-    # Transform into data frame
-    data_all = pd.DataFrame(all_data_orig, columns=columns)
+    # the frame is built from the read-only tensor of the selected
+    # features; only the frame itself is a copy
+    return load_feature_tensor().sel(feature=features).to_frame()
 
-    return data_all
+
+def load_feature_tensor():
+    """
+    Returns a read-only FeatureTensor of the 9 features over the 11
+    2-hour time bins of each of the 1921 mouse days.
+
+    Its values attribute is a (9, 1921, 11) view of the memory-mapped
+    features file, indexed by feature, mouse day and time bin, and its
+    labels attribute a (1921, 3) view of the strain, mouse and day of
+    each mouse day.  Nothing is copied unless the caller asks for it.
+
+    Returns
+    -------
+    tensor : FeatureTensor
+
+    Examples
+    --------
+    >>> tensor = load_feature_tensor()
+    >>> food = tensor.sel(feature="Food", strain=0).values
+    >>> matrix = tensor.sel(feature=["Food", "Water"]).to_matrix()
+    """
+    # 9 x 1921 x (3 labels + 11 feature time bins)
+    all_features = _features_array().view(np.ndarray)
+    return FeatureTensor(all_features[:, :, 3:], all_features[0, :, :3])
 
 
 def load_intervals(feature):
@@ -174,6 +215,10 @@ def load_intervals(feature):
     start: the start time
     stop: the stop time
 
+    Each feature directory is read once per process and kept in
+    ``intervals_cache``; later calls return a copy of the cached table.
+    Use ``load_intervals_index`` to look up single mouse-days.
+
     Parameters
     ----------
     feature: {"AS", "F", "IS", "M_AS", "M_IS", "W"}
@@ -193,31 +238,83 @@ def load_intervals(feature):
         raise ValueError(
             'Input value must be one of {"AS", "F", "IS", "M_AS", "M_IS", "W"}'
         )
-    # get all file names
-    file_names = _os.listdir(_os.path.join(data_dir, "intervals", feature))
+    # hand out a copy so that callers cannot alter the cached table
+    return load_intervals_index(feature).table.copy()
+
+
+def load_intervals_index(feature):
+    """
+    Return a ``MouseDayIndex`` over the interval data of `feature`,
+    for looking up the intervals of one mouse-day without scanning
+    the whole table.
+
+    The index is built once per feature and kept in
+    ``intervals_cache``; it is shared, so its table must not be
+    modified.
+
+    Parameters
+    ----------
+    feature: {"AS", "F", "IS", "M_AS", "M_IS", "W"}
+
+    Returns
+    -------
+    index : MouseDayIndex
+        index whose ``get(strain, mouse, day)`` returns the
+        (n x 2) start and stop times of a mouse-day
+
+    Examples
+    --------
+    >>> AS = load_intervals_index('AS')
+    >>> AS.get(0, 0, 0).shape
+    (10, 2)
+    """
+    if feature not in INTERVAL_FEATURES:
+        raise ValueError(
+            'Input value must be one of {"AS", "F", "IS", "M_AS", "M_IS", "W"}'
+        )
+    return intervals_cache.get(
+        feature, lambda: MouseDayIndex(_read_intervals(feature)))
+
+
+def _read_intervals(feature):
+    """
+    Read the interval files of `feature` from disk into a
+    pandas.DataFrame, see ``load_intervals``.
+    """
+    # the catalog lists the files sorted by (strain, mouse, day), so that
+    # the rows come out sorted without sorting the table itself
+    catalog = get_catalog()
+    keys = catalog.interval_keys(feature)
     # check if directory is empty
-    if len(file_names) == 0:
+    if len(keys) == 0:
         raise ValueError('Directory is empty; no file found.')
-    # initialized data frame
-    # use for loop to load every file and concat to overall data frame
-    dt = pd.DataFrame()
-    for item in file_names:
-        strain = int(item.split("strain")[1].split("_mouse")[0])
-        mouse = int(item.split("mouse")[1].split("_day")[0])
-        day = int(item.split("day")[1].split(".npy")[0])
-        path = _os.path.join(data_dir, "intervals", feature, item)
-        sub = np.load(path)
-        dt_sub = pd.DataFrame()
-        dt_sub["strain"] = [strain] * sub.shape[0]
-        dt_sub["mouse"] = [mouse] * sub.shape[0]
-        dt_sub["day"] = [day] * sub.shape[0]
-        dt_sub["start"] = sub[:, 0]
-        dt_sub["stop"] = sub[:, 1]
-        dt = pd.concat([dt, dt_sub])
-    # sort based on strain, mouse and day
-    dt = dt.sort(["strain", "mouse", "day"])
-    dt.index = range(dt.shape[0])
-    return dt
+    subs = [np.load(catalog.interval_path(feature, *key)).reshape(-1, 2)
+            for key in keys]
+    lengths = [sub.shape[0] for sub in subs]
+    # fill one pre-sized record array; the labels are broadcast per file
+    dt = np.empty(sum(lengths), dtype=[("strain", np.int64),
+                                       ("mouse", np.int64),
+                                       ("day", np.int64),
+                                       ("start", np.float64),
+                                       ("stop", np.float64)])
+    labels = np.array(keys, dtype=np.int64)
+    dt["strain"] = np.repeat(labels[:, 0], lengths)
+    dt["mouse"] = np.repeat(labels[:, 1], lengths)
+    dt["day"] = np.repeat(labels[:, 2], lengths)
+    both = np.concatenate(subs)
+    dt["start"] = both[:, 0]
+    dt["stop"] = both[:, 1]
+    return pd.DataFrame(dt)
+
+
+def _movement_columns(strain, mouse, day):
+    """
+    Return the t, x and y arrays of a mouse-day, memory-mapped from the
+    packed store or from the per-day files, so that slicing them only
+    reads the rows needed.
+    """
+    movement = MouseDay(strain, mouse, day)
+    return movement["t"], movement["x"], movement["y"]
 
 
 def load_movement(strain, mouse, day):
@@ -231,6 +328,13 @@ def load_movement(strain, mouse, day):
     y: Y coordinates indicating the front-back position of the cage
     isHB: Boolean indicating whether the point is in the home base or not
 
+    Once the movement data has been packed with ``pack_movement``, the
+    data is read from the memory-mapped store instead of the per-day
+    files, and the t, x, y columns are read-only views of that store.
+    Mouse-days whose files have changed since they were packed are read
+    from the per-day files.
+    To read only the columns needed, use ``MouseDay`` instead.
+
     Parameters
     ----------
     strain: int
@@ -251,14 +355,15 @@ def load_movement(strain, mouse, day):
     >>> movement = load_movement(0, 0, 0)
     >>> movement = load_movement(1, 2, 1)
     """
-    # check if all inputs are nonnegative integers
-    conditions_value = [strain < 0, mouse < 0, day < 0]
-    conditions_type = [type(strain) != int, type(mouse) != int,
-                       type(day) != int]
-    if any(conditions_value):
-        raise ValueError("Input values need to be nonnegative")
-    if any(conditions_type):
-        raise TypeError("Input values need to be integer")
+    _check_mouseday(strain, mouse, day)
+    # use the packed columnar store when it has been built
+    store = _store.open_store()
+    if store is not None and store.is_current(strain, mouse, day):
+        txy, HB = store.get(strain, mouse, day)
+        # the t, x, y block is a view of the memory-mapped store
+        dt = pd.DataFrame(txy.T, columns=["t", "x", "y"], copy=False)
+        dt["isHB"] = HB
+        return dt
     # load all four files of HB, CT, CX and CY data
     NHB_path = "txy_coords/C_idx_HB/C_idx_HB_strain{}_mouse{}_day{}.npy".\
         format(strain, mouse, day)
@@ -295,15 +400,18 @@ def _lookup_intervals(times, intervals):
     ----------
     times: numpy.array of floats
         an array of timestamps
-    intervals: pandas.DataFrame
+    intervals: pandas.DataFrame or numpy.array
         a data frame containing columns 'start' and
-        'stop', represent a series of time intervals
+        'stop', or an (n x 2) array of start and stop times,
+        represent a series of time intervals
 
     Returns
     -------
     numpy.array of booleans
         Array of booleans representing whether the timestamps
-        in `times` fell in the intervals in `intervals`
+        in `times` fell in the intervals in `intervals`; a
+        pandas.Series with the index of `times` if `times` is
+        a pandas.Series
 
     Examples
     --------
@@ -318,8 +426,12 @@ def _lookup_intervals(times, intervals):
     2    False
     dtype: bool
     """
-    ints = Intervals(intervals[['start', 'stop']])
-    return times.map(ints.contains)
+    if isinstance(intervals, pd.DataFrame):
+        intervals = intervals[['start', 'stop']].values
+    in_intervals = Intervals(intervals).contains_many(times)
+    if isinstance(times, pd.Series):
+        return pd.Series(in_intervals, index=times.index)
+    return in_intervals
 
 
 def load_movement_and_intervals(strain, mouse, day,
@@ -376,11 +488,9 @@ def load_movement_and_intervals(strain, mouse, day,
         raise ValueError('features must be a string or iterable of strings')
     movements = load_movement(strain, mouse, day)
     for f in features:
-        intervals = load_intervals(feature=f)
-        mouse_intervals = intervals[(intervals['strain'] == strain) &
-                                    (intervals['mouse'] == mouse) &
-                                    (intervals['day'] == day)]
-        movements[f] = _lookup_intervals(movements['t'], mouse_intervals)
+        mouse_intervals = load_intervals_index(f).get(strain, mouse, day)
+        movements[f] = _lookup_intervals(movements['t'].values,
+                                         mouse_intervals)
 
     return movements
 
@@ -416,7 +526,7 @@ def load_start_time_end_time(strain, mouse, day):
     return tuple(np.load(path_to_file))
 
 
-def distances(strain, mouse, day, step=50):
+def distances(strain, mouse, day, step=50, chunksize=None):
     """
     Return a numpy array object of project movement data
     for the specified combination of strain, mouse and day.
@@ -449,6 +559,9 @@ def distances(strain, mouse, day, step=50):
     step: float
         positive float defining the time between two observations
         default corresponds to 1 second
+    chunksize: int, optional
+        if given, the movement data is read chunksize samples at a
+        time (see ``iter_distances``) instead of all at once
 
     Returns
     -------
@@ -458,22 +571,101 @@ def distances(strain, mouse, day, step=50):
     --------
     >>> dist = distances(0, 0, 0, step=1e2)
     """
-    movement = load_movement(strain, mouse, day)
-    # Compute distance between samples
-    dist = np.sqrt(movement["x"].diff()[1:]**2 + movement["y"].diff()[1:]**2)
-    time = movement['t'][1:] - movement['t'][0]
-    t_final = time[len(time)-1]
-    # Aggregate distances according to step
-    aggregate = np.zeros(int(t_final/step))
-    j = 1
-    for i in range(len(aggregate)):
-        while time[j] < i*step:
-            aggregate[i] = aggregate[i] + dist[j]
-            j = j+1
-    return(aggregate)
+    pieces = list(iter_distances(strain, mouse, day, step=step,
+                                 chunksize=chunksize))
+    if len(pieces) == 0:
+        return np.zeros(0)
+    return np.concatenate(pieces)
 
 
-def distances_bymouse(strain, mouse, step=50, verbose=False):
+def iter_distances(strain, mouse, day, step=50, chunksize=2 ** 20):
+    """
+    Iterate over consecutive pieces of ``distances(strain, mouse, day,
+    step)``, reading the movement data chunk by chunk.
+
+    The movement columns are memory-mapped, and only about chunksize
+    samples are held in memory at a time.  Each piece holds the time
+    steps that are complete at the end of a chunk, so that the pieces
+    concatenate to exactly the output of ``distances``.  Step distances
+    already saved in the derived column store (see
+    ``precompute_derived``) are read from it instead of being
+    recomputed.
+
+    Parameters
+    ----------
+    strain: int
+        nonnegative integer indicating the strain number
+    mouse: int
+        nonnegative integer indicating the mouse number
+    day: int
+        nonnegative integer indicating the day number
+    step: float
+        positive float defining the time between two observations
+    chunksize: int, optional
+        number of samples read at a time; None reads the whole day
+
+    Returns
+    -------
+    pieces : generator of numpy arrays
+
+    Examples
+    --------
+    >>> total = sum(piece.sum() for piece in iter_distances(0, 0, 0))
+    """
+    t, x, y = _movement_columns(strain, mouse, day)
+    # step distances saved by precompute_derived, if any
+    saved = open_derived().load("dist", strain, mouse, day)
+    n = t.shape[0]
+    # as in the original loop, the number of steps stops at the time of
+    # the second to last sample
+    num_bins = int((t[n - 2] - t[0]) / step)
+    if chunksize is None:
+        chunksize = n
+    # samples lo to n - 1 and steps done to num_bins - 1 remain
+    lo, done, reach, size = 1, 0, -np.inf, chunksize
+    while done < num_bins:
+        hi = min(lo + size, n)
+        # a sample goes to the first step after the largest time so far
+        time = np.maximum(np.maximum.accumulate(t[lo:hi] - t[0]), reach)
+        bins = _time_bins(time, step, num_bins)
+        if hi < n and bins[-1] < num_bins:
+            # keep the last, maybe incomplete, step for the next chunk
+            cut = bins.searchsorted(bins[-1])
+            if cut == 0:
+                size *= 2
+                continue
+            upto = bins[-1]
+        else:
+            cut, upto = bins.searchsorted(num_bins), num_bins
+        if saved is not None:
+            dist = saved[lo - 1:lo + cut - 1]
+        else:
+            dist = np.sqrt((x[lo:lo + cut] - x[lo - 1:lo + cut - 1]) ** 2 +
+                           (y[lo:lo + cut] - y[lo - 1:lo + cut - 1]) ** 2)
+        yield np.bincount(bins[:cut] - done, weights=dist,
+                          minlength=upto - done)
+        if cut:
+            reach = time[cut - 1]
+        lo, done, size = lo + cut, upto, chunksize
+
+
+def _time_bins(time, step, num_bins):
+    """
+    Smallest i >= 0 such that time < i * step, for each element of the
+    nondecreasing array time; elements at or past num_bins get num_bins.
+    """
+    bins = np.clip(np.floor(time / step) + 1, 0, num_bins).astype(np.int64)
+    # correct the rounding of the division so that the comparisons are
+    # the ones made by the original loop
+    while True:
+        down = (bins > 0) & (time < (bins - 1) * step)
+        up = (bins < num_bins) & ~(time < bins * step)
+        if not (down.any() or up.any()):
+            return bins
+        bins = bins - down + up
+
+
+def distances_bymouse(strain, mouse, step=50, verbose=False, workers=1):
     """
     Aggregates 'distances' for all days of recorded data for
     one particular mouse.
@@ -493,6 +685,9 @@ def distances_bymouse(strain, mouse, step=50, verbose=False):
     step: float
         positive float defining the time between two observations
         default corresponds to 1 second
+    workers: int, optional
+        number of processes computing the days in parallel; None uses
+        every core.  The output does not depend on it.
 
     Returns
     -------
@@ -501,22 +696,13 @@ def distances_bymouse(strain, mouse, step=50, verbose=False):
     Examples
     --------
     >>> dist = distances_bymouse(0, 0, step=1e2)
+    >>> dist = distances_bymouse(0, 0, step=1e2, workers=4)
     """
-    day = 0
-    res = np.array([])
-    while True:
-        try:
-            res = np.append(res, distances(strain, mouse, day,
-                                           step=step))
-            day += 1
-            if verbose:
-                print('day %s done.' % day)
-        except ValueError:
-            break
-    return(res)
+    return _distances_concat(list_mousedays(strain, mouse), step,
+                             verbose, workers)
 
 
-def distances_bystrain(strain, step=50, verbose=False):
+def distances_bystrain(strain, step=50, verbose=False, workers=1):
     """
     Aggregates distances_bymouse for all mice in one given
     strain.
@@ -534,6 +720,9 @@ def distances_bystrain(strain, step=50, verbose=False):
     step: float
         positive float defining the time between two observations
         default corresponds to 1 second
+    workers: int, optional
+        number of processes computing the days in parallel; None uses
+        every core.  The output does not depend on it.
 
     Returns
     -------
@@ -542,15 +731,72 @@ def distances_bystrain(strain, step=50, verbose=False):
     Examples
     --------
     >>> dist = distances_bystrain(0, step=1e2)
+    >>> dist = distances_bystrain(0, step=1e2, workers=4)
+    """
+    return _distances_concat(list_mousedays(strain), step, verbose,
+                             workers)
+
+
+def list_mousedays(strain=None, mouse=None):
+    """
+    Return the sorted list of the (strain, mouse, day) triples for which
+    movement data exists, optionally only those of one strain or of one
+    mouse of a strain.  They are read from the data catalog, see
+    ``get_catalog``.
+
+    Parameters
+    ----------
+    strain: int, optional
+        nonnegative integer indicating the strain number
+    mouse: int, optional
+        nonnegative integer indicating the mouse number
+
+    Returns
+    -------
+    mousedays : list of tuples
+
+    Examples
+    --------
+    >>> strains = sorted(set(key[0] for key in list_mousedays()))
+    >>> days = list_mousedays(0, 0)
     """
-    mouse = 0
-    res = np.array([])
-    dist = np.array([0])
-    while dist.size > 0:
-        dist = distances_bymouse(strain, mouse,
-                                 step=step)
-        res = np.append(res, dist)
-        mouse += 1
-        if verbose:
-            print('mouse %s done.' % mouse)
-    return(res)
+    return get_catalog().keys(strain, mouse)
+
+
+def _distances_length(strain, mouse, day, step):
+    """ length of the output of distances, read from two samples """
+    t = _movement_columns(strain, mouse, day)[0]
+    return int((t[t.shape[0] - 2] - t[0]) / step)
+
+
+def _distances_task(args):
+    key, step = args
+    return distances(*key, step=step)
+
+
+def _distances_concat(keys, step, verbose=False, workers=1):
+    """
+    Concatenation of the distances of the mouse-days keys, in order.
+    The output is allocated once and each day is copied to its offset
+    as it is computed, in this process or in a pool of workers.
+    """
+    lengths = [_distances_length(*key, step=step) for key in keys]
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    res = np.empty(offsets[-1])
+    tasks = [(key, step) for key in keys]
+    pool = None
+    if workers == 1 or len(keys) < 2:
+        results = six.moves.map(_distances_task, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_distances_task, tasks)
+    try:
+        for i, dist in enumerate(results):
+            res[offsets[i]:offsets[i + 1]] = dist
+            if verbose:
+                print('strain %s mouse %s day %s done.' % keys[i])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return res
@@ -0,0 +1,102 @@
+"""Size-bounded least-recently-used cache for loaded data tables."""
+
+from __future__ import print_function, absolute_import, division
+
+import collections
+import threading
+
+import numpy as np
+import pandas as pd
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "entries", "nbytes", "max_bytes"])
+
+
+def nbytes(value):
+    """
+    Return an estimate of the memory held by `value`, in bytes.
+
+    numpy arrays and pandas objects are measured exactly; tuples, lists
+    and dicts are measured through their items; any other object with an
+    ``nbytes`` attribute reports it, and everything else counts as 0.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(index=True)))
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(nbytes(item) for item in value.values())
+    return int(getattr(value, "nbytes", 0))
+
+
+class LRUCache(object):
+    """ Least-recently-used mapping bounded by the memory of its values.
+
+    parameters
+        max_bytes: the cache evicts the least recently used entries
+            until the values it holds take at most max_bytes
+    """
+
+    def __init__(self, max_bytes=2 ** 28):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, loader):
+        """ Return the value cached under key, calling loader() to
+            compute and store it on a miss. """
+        with self._lock:
+            if key in self._entries:
+                value, size = self._entries.pop(key)
+                self._entries[key] = (value, size)
+                self.hits += 1
+                return value
+            self.misses += 1
+            value = loader()
+            self.put(key, value)
+            return value
+
+    def put(self, key, value):
+        """ Store value under key and evict entries over the size limit.
+            A value larger than the whole cache is not stored. """
+        with self._lock:
+            self.invalidate(key)
+            size = nbytes(value)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            self._evict()
+
+    def invalidate(self, key=None):
+        """ Drop key from the cache, or every entry when key is None. """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._nbytes = 0
+            elif key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+
+    def resize(self, max_bytes):
+        """ Change the size limit, evicting entries if needed. """
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def info(self):
+        """ Return hit and miss counts and the current size. """
+        return CacheInfo(self.hits, self.misses, len(self._entries),
+                         self._nbytes, self.max_bytes)
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._entries:
+            self._nbytes -= self._entries.popitem(last=False)[1][1]
@@ -0,0 +1,274 @@
+"""Catalog of the mouse-days available in the ``mousestyles/data`` tree.
+
+The catalog is built in a single walk over the ``txy_coords`` and
+``intervals`` directories.  For each mouse-day it records the number of
+movement samples, the recording start and end times and the size of its
+movement files; for each interval feature, the mouse-days which have a
+file.  It is saved as ``catalog.json`` next to the data, so that listing
+what exists costs a lookup instead of a directory scan or a series of
+failed opens.
+
+The saved catalog is checked against the size and modification time of
+every file when it is first read by a process, and rebuilt if a file was
+added, removed or modified.  Afterwards, the catalog kept in memory is
+only checked against the modification times of the data directories:
+adding or removing a file is detected, but not a file rewritten in
+place; ``build_catalog`` rebuilds it in that case.
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import json
+import os as _os
+
+import numpy as np
+
+from mousestyles import data_dir
+from mousestyles.data.store import _parse_mouseday
+
+CATALOG_FILE = "catalog.json"
+MOVEMENT_COLUMNS = ["CT", "CX", "CY", "C_idx_HB"]
+TIMES_COLUMN = "recordingStartTimeEndTime"
+INTERVAL_FEATURES = ["AS", "F", "IS", "M_AS", "M_IS", "W"]
+
+MOUSEDAY_DTYPE = np.dtype([("strain", np.int64), ("mouse", np.int64),
+                           ("day", np.int64), ("samples", np.int64),
+                           ("start_time", np.float64),
+                           ("end_time", np.float64),
+                           ("nbytes", np.int64)])
+
+
+def _directories():
+    """ data directories scanned by the catalog, relative to the data
+        directory """
+    return ([_os.path.join("txy_coords", column)
+             for column in MOVEMENT_COLUMNS + [TIMES_COLUMN]] +
+            [_os.path.join("intervals", feature)
+             for feature in INTERVAL_FEATURES])
+
+
+def _scan(path):
+    """
+    List the ``.npy`` files of the data directories under path, with
+    their size and modification time; a single stat per file.
+    """
+    files = {}
+    for directory in _directories():
+        full = _os.path.join(path, directory)
+        if not _os.path.isdir(full):
+            continue
+        for item in _os.listdir(full):
+            if not item.endswith(".npy"):
+                continue
+            stat = _os.stat(_os.path.join(full, item))
+            files[_os.path.join(directory, item)] = [stat.st_size,
+                                                     stat.st_mtime]
+    return files
+
+
+def _directory_mtimes(path):
+    mtimes = {}
+    for directory in _directories():
+        full = _os.path.join(path, directory)
+        if _os.path.isdir(full):
+            mtimes[directory] = _os.path.getmtime(full)
+    return mtimes
+
+
+class Catalog(object):
+    """ Mouse-days and interval files available in a data directory.
+
+    parameters
+        path: data directory, by default ``mousestyles/data``
+        mousedays: structured array with fields strain, mouse, day,
+            samples, start_time, end_time and nbytes, sorted by strain,
+            mouse and day
+        intervals: dict mapping each interval feature to the sorted list
+            of the (strain, mouse, day) triples which have a file
+        files: dict mapping the path of each file, relative to path,
+            to its size and modification time
+    """
+
+    def __init__(self, path, mousedays, intervals, files):
+        self.path = path
+        self.mousedays = mousedays
+        self.intervals = intervals
+        self.files = files
+        self._rows = dict(
+            ((int(row["strain"]), int(row["mouse"]), int(row["day"])), i)
+            for i, row in enumerate(mousedays))
+
+    def __len__(self):
+        return self.mousedays.shape[0]
+
+    def __contains__(self, key):
+        return tuple(key) in self._rows
+
+    def keys(self, strain=None, mouse=None):
+        """ sorted (strain, mouse, day) triples with movement data,
+            optionally of one strain or of one mouse of a strain """
+        return [key for key in sorted(self._rows)
+                if (strain is None or key[0] == strain) and
+                (mouse is None or key[1] == mouse)]
+
+    def strains(self):
+        """ sorted strain numbers """
+        return sorted(set(key[0] for key in self._rows))
+
+    def mice(self, strain):
+        """ sorted mouse numbers of a strain """
+        return sorted(set(key[1] for key in self.keys(strain)))
+
+    def days(self, strain, mouse):
+        """ sorted day numbers of a mouse """
+        return [key[2] for key in self.keys(strain, mouse)]
+
+    def info(self, strain, mouse, day):
+        """ the row of mousedays describing a mouse-day """
+        try:
+            return self.mousedays[self._rows[(strain, mouse, day)]]
+        except KeyError:
+            raise ValueError("No data exists for strain {}, mouse {}, day {}".
+                             format(strain, mouse, day))
+
+    def interval_keys(self, feature):
+        """ sorted (strain, mouse, day) triples with intervals of
+            feature """
+        return self.intervals.get(feature, [])
+
+    def interval_path(self, feature, strain, mouse, day):
+        """ path of the interval file of feature for a mouse-day """
+        return _os.path.join(self.path, "intervals", feature,
+                             "{}_strain{}_mouse{}_day{}.npy".format(
+                                 feature, strain, mouse, day))
+
+    def is_current(self):
+        """ whether the files on disk are still the ones catalogued """
+        return _scan(self.path) == self.files
+
+    def to_json(self):
+        return json.dumps({
+            "mousedays": [[row[name].item() for name in MOUSEDAY_DTYPE.names]
+                          for row in self.mousedays],
+            "intervals": self.intervals,
+            "files": self.files})
+
+    @classmethod
+    def from_json(cls, path, text):
+        content = json.loads(text)
+        mousedays = np.array([tuple(row) for row in content["mousedays"]],
+                             dtype=MOUSEDAY_DTYPE)
+        intervals = dict((feature, [tuple(key) for key in keys])
+                         for feature, keys in content["intervals"].items())
+        return cls(path, mousedays, intervals, content["files"])
+
+
+def build_catalog(path=None, save=True):
+    """
+    Walk the data directory once and return its ``Catalog``.
+
+    Parameters
+    ----------
+    path: str, optional
+        data directory, defaults to ``mousestyles/data``
+    save: bool, optional
+        whether to write the catalog to ``catalog.json`` in path; the
+        catalog is still returned when the directory is read-only
+
+    Returns
+    -------
+    catalog : Catalog
+
+    Examples
+    --------
+    >>> catalog = build_catalog()
+    >>> catalog.keys(0, 0)[:2]
+    [(0, 0, 0), (0, 0, 1)]
+    """
+    if path is None:
+        path = data_dir
+    files = _scan(path)
+    by_directory = {}
+    for name in files:
+        directory, item = _os.path.split(name)
+        by_directory.setdefault(directory, []).append(
+            (_parse_mouseday(item), name))
+    movement = dict((column, dict(by_directory.get(
+        _os.path.join("txy_coords", column), [])))
+        for column in MOVEMENT_COLUMNS + [TIMES_COLUMN])
+    # a mouse-day is available when all its movement columns are
+    keys = sorted(set.intersection(*[set(movement[column])
+                                     for column in MOVEMENT_COLUMNS]))
+    mousedays = np.zeros(len(keys), dtype=MOUSEDAY_DTYPE)
+    for row, key in zip(mousedays, keys):
+        row["strain"], row["mouse"], row["day"] = key
+        # only the header of the file is read
+        row["samples"] = np.load(
+            _os.path.join(path, movement["CT"][key]), mmap_mode="r").shape[0]
+        row["nbytes"] = sum(files[movement[column][key]][0]
+                            for column in MOVEMENT_COLUMNS)
+        if key in movement[TIMES_COLUMN]:
+            row["start_time"], row["end_time"] = np.load(
+                _os.path.join(path, movement[TIMES_COLUMN][key]))
+        else:
+            row["start_time"] = row["end_time"] = np.nan
+    intervals = dict((feature, sorted(
+        key for key, name in by_directory.get(
+            _os.path.join("intervals", feature), [])))
+        for feature in INTERVAL_FEATURES)
+    catalog = Catalog(path, mousedays, intervals, files)
+    if save:
+        try:
+            with open(_os.path.join(path, CATALOG_FILE), "w") as f:
+                f.write(catalog.to_json())
+        except (IOError, OSError):
+            pass
+    _catalogs[path] = (_directory_mtimes(path), catalog)
+    return catalog
+
+
+_catalogs = {}
+
+
+def get_catalog(path=None):
+    """
+    Return the ``Catalog`` of the data directory path.
+
+    The catalog saved in ``catalog.json`` is used if the files it lists
+    are unchanged, and rebuilt otherwise.  It is then kept in memory and
+    only checked again when one of the data directories changes, that
+    is when a file is added or removed; a file rewritten in place is not
+    noticed until ``build_catalog`` is called or a new process starts.
+
+    Parameters
+    ----------
+    path: str, optional
+        data directory, defaults to ``mousestyles/data``
+
+    Returns
+    -------
+    catalog : Catalog
+
+    Examples
+    --------
+    >>> strains = get_catalog().strains()
+    """
+    if path is None:
+        path = data_dir
+    mtimes = _directory_mtimes(path)
+    cached = _catalogs.get(path)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+    file_name = _os.path.join(path, CATALOG_FILE)
+    if _os.path.exists(file_name):
+        try:
+            with open(file_name) as f:
+                catalog = Catalog.from_json(path, f.read())
+        except (IOError, OSError, ValueError, KeyError):
+            catalog = None
+    else:
+        catalog = None
+    if catalog is None or not catalog.is_current():
+        return build_catalog(path)
+    _catalogs[path] = (mtimes, catalog)
+    return catalog
@@ -0,0 +1,150 @@
+"""On-disk cache of the columns derived from the movement data.
+
+The derived columns of ``MouseDay`` (step distance, dt, speed and
+heading) are saved once per mouse-day as ``.npy`` files, and memory-mapped
+on later reads instead of being recomputed from the raw movement files.
+``MouseDay`` reads the files of the shared store by default, but nothing
+is written unless asked for, with ``precompute_derived`` or a
+``MouseDay`` given ``derived=True`` or a store:
+
+    derived/v<version>/<column>/<column>_strain<s>_mouse<m>_day<d>.npy
+
+The version is ``DERIVED_VERSION``; it must be increased whenever the
+computation of a derived column changes, so that files written by older
+code are no longer used.
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import os as _os
+
+import numpy as np
+
+from mousestyles import data_dir
+
+DERIVED_DIR = _os.path.join(data_dir, "derived")
+DERIVED_VERSION = 1
+
+
+def save_npy(file_name, value):
+    """ Save an array to file_name, creating its directory; the file is
+        written under a temporary name and renamed, so that readers never
+        see a partial file.  Returns False if it cannot be written. """
+    temp_name = "{}.{}.tmp".format(file_name, _os.getpid())
+    try:
+        if not _os.path.isdir(_os.path.dirname(file_name)):
+            _os.makedirs(_os.path.dirname(file_name))
+        with open(temp_name, "wb") as f:
+            np.save(f, value)
+        _os.rename(temp_name, file_name)
+    except (IOError, OSError):
+        if _os.path.exists(temp_name):
+            _os.remove(temp_name)
+        return False
+    return True
+
+
+class DerivedStore(object):
+    """ Directory of derived columns for one version of the derivations.
+
+    parameters
+        path: root directory, by default ``data/derived``
+        version: version of the derivations, by default DERIVED_VERSION
+    """
+
+    def __init__(self, path=None, version=DERIVED_VERSION):
+        if path is None:
+            path = DERIVED_DIR
+        self.path = _os.path.join(path, "v{}".format(version))
+        self.version = version
+
+    def file(self, name, strain, mouse, day, tag=None):
+        """ path of the file of column name for a mouse-day; the
+            optional tag identifies the inputs the column was derived
+            from, e.g. a digest of their files """
+        suffix = "" if tag is None else "_" + tag
+        return _os.path.join(self.path, name,
+                             "{}_strain{}_mouse{}_day{}{}.npy".format(
+                                 name, strain, mouse, day, suffix))
+
+    def __contains__(self, item):
+        return _os.path.exists(self.file(*item))
+
+    def load(self, name, strain, mouse, day, tag=None):
+        """ read-only memory map of a saved column, or None """
+        file_name = self.file(name, strain, mouse, day, tag)
+        if not _os.path.exists(file_name):
+            return None
+        return np.load(file_name, mmap_mode="r")
+
+    def save(self, name, strain, mouse, day, value, tag=None):
+        """ Save a column, see ``save_npy``.
+            Returns False if the directory cannot be written. """
+        return save_npy(self.file(name, strain, mouse, day, tag), value)
+
+    def get(self, name, strain, mouse, day, compute, tag=None):
+        """ The saved column, or else compute(), which is saved.
+            Returns the column and whether a file was written. """
+        value = self.load(name, strain, mouse, day, tag)
+        if value is not None:
+            return value, False
+        value = compute()
+        return value, self.save(name, strain, mouse, day, value, tag)
+
+
+_stores = {}
+
+
+def open_derived(path=None, version=DERIVED_VERSION):
+    """ Return the shared ``DerivedStore`` of path and version """
+    key = (path, version)
+    if key not in _stores:
+        _stores[key] = DerivedStore(path, version)
+    return _stores[key]
+
+
+def precompute_derived(names=None, keys=None, path=None, verbose=False):
+    """
+    Compute and save the derived columns of many mouse-days at once.
+
+    Parameters
+    ----------
+    names: list of str, optional
+        derived columns to save, by default all of them
+    keys: list of tuples, optional
+        (strain, mouse, day) triples, by default every mouse-day
+    path: str, optional
+        root directory of the store, defaults to ``data/derived``
+    verbose: bool, optional
+        print each mouse-day when it is done
+
+    Returns
+    -------
+    count : int
+        number of files written; the columns which cannot be saved
+        are not counted
+
+    Examples
+    --------
+    >>> count = precompute_derived(["dist", "dt", "speed"])
+    """
+    from mousestyles.data.mouseday import MouseDay, DERIVED_COLUMNS
+    from mousestyles.data.catalog import get_catalog
+
+    if names is None:
+        names = DERIVED_COLUMNS
+    if keys is None:
+        keys = get_catalog().keys()
+    store = open_derived(path)
+    count = 0
+    for key in keys:
+        strain, mouse, day = key
+        movement = MouseDay(strain, mouse, day, derived=None)
+        for name in names:
+            if (name, strain, mouse, day) in store:
+                continue
+            if store.save(name, strain, mouse, day, movement[name]):
+                count += 1
+        if verbose:
+            print('strain %s mouse %s day %s done.' % tuple(key))
+    return count
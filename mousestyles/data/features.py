@@ -0,0 +1,118 @@
+"""Read-only (feature, mouse-day, time bin) view of the features array."""
+
+from __future__ import print_function, absolute_import, division
+
+import numpy as np
+import pandas as pd
+
+FEATURES = ["ASProbability", "ASNumbers", "ASDurations", "Food", "Water",
+            "Distance", "ASFoodIntensity", "ASWaterIntensity",
+            "MoveASIntensity"]
+BINS = list(range(0, 22, 2))
+
+
+def _as_index(positions):
+    """
+    A slice selecting positions if they are evenly spaced and increasing,
+    so that indexing with it gives a view; otherwise the positions.
+    """
+    positions = np.asarray(positions, dtype=np.intp).ravel()
+    if positions.shape[0] == 0:
+        return slice(0, 0)
+    if positions.shape[0] == 1:
+        return slice(positions[0], positions[0] + 1)
+    steps = np.diff(positions)
+    if steps[0] > 0 and np.all(steps == steps[0]):
+        return slice(positions[0], positions[-1] + 1, steps[0])
+    return positions
+
+
+class FeatureTensor(object):
+    """ Features of mouse-days over the 2-hour time bins.
+
+    values is a (features, mousedays, bins) array and labels the
+    (mousedays, 3) array of the strain, mouse and day of each mouse-day.
+    Both are read-only views of the memory-mapped features file when the
+    tensor comes from ``load_feature_tensor``; ``sel`` keeps them views
+    whenever the selection is a range, and ``copy`` makes writable
+    copies.
+
+    parameters
+        values: (features, mousedays, bins) array
+        labels: (mousedays, 3) array
+        features: names of the features, by default FEATURES
+        bins: start hours of the time bins, by default 0, 2, ..., 20
+    """
+
+    dims = ("feature", "mouseday", "bin")
+
+    def __init__(self, values, labels, features=None, bins=None):
+        self.values = values
+        self.labels = labels
+        self.features = list(FEATURES if features is None else features)
+        self.bins = list(BINS if bins is None else bins)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def __repr__(self):
+        return "FeatureTensor(features={}, mousedays={}, bins={})".format(
+            *self.shape)
+
+    def sel(self, feature=None, bin=None, strain=None, mouse=None,
+            day=None):
+        """ New FeatureTensor restricted to the given features (names),
+            bins (start hours) and mouse-days (strain, mouse and day
+            numbers); each argument is a value or a list of values, and
+            None keeps the whole axis. """
+        values, labels = self.values, self.labels
+        features, bins = self.features, self.bins
+        if feature is not None:
+            idx = _as_index([self._position(self.features, name, "feature")
+                             for name in np.atleast_1d(feature)])
+            values = values[idx]
+            features = list(np.array(features, dtype=object)[idx])
+        if bin is not None:
+            idx = _as_index([self._position(self.bins, hour, "bin")
+                             for hour in np.atleast_1d(bin)])
+            values = values[:, :, idx]
+            bins = list(np.array(bins)[idx])
+        mask = np.ones(labels.shape[0], dtype=bool)
+        for column, wanted in enumerate([strain, mouse, day]):
+            if wanted is not None:
+                wanted = np.atleast_1d(wanted)
+                mask &= (labels[:, column, None] == wanted).any(axis=1)
+        if not mask.all():
+            idx = _as_index(np.flatnonzero(mask))
+            values = values[:, idx]
+            labels = labels[idx]
+        return FeatureTensor(values, labels, features, bins)
+
+    @staticmethod
+    def _position(names, name, axis):
+        try:
+            return names.index(name)
+        except ValueError:
+            raise ValueError("{} is not a {} of the tensor".format(name, axis))
+
+    def copy(self):
+        """ FeatureTensor holding writable copies of values and labels """
+        return FeatureTensor(np.array(self.values), np.array(self.labels),
+                             self.features, self.bins)
+
+    def to_matrix(self):
+        """ (mousedays, features * bins) array: for each mouse-day, the
+            bins of the first feature, then of the second, ...  (a copy
+            unless a view is possible) """
+        return self.values.transpose(1, 0, 2).reshape(
+            self.shape[1], self.shape[0] * self.shape[2])
+
+    def to_frame(self):
+        """ pandas.DataFrame of the labels and of to_matrix, with columns
+            strain, mouse, day, then <feature>_<hour> """
+        columns = ["strain", "mouse", "day"]
+        for feature in self.features:
+            columns += [feature + "_" + str(hour) for hour in self.bins]
+        return pd.DataFrame(np.hstack([self.labels, self.to_matrix()]),
+                            columns=columns)
@@ -0,0 +1,81 @@
+"""Index of the mouse-days of a table sorted by (strain, mouse, day)."""
+
+from __future__ import print_function, absolute_import, division
+
+import numpy as np
+
+from mousestyles.data.cache import nbytes
+
+LABELS = ["strain", "mouse", "day"]
+
+
+class MouseDayIndex(object):
+    """ Maps each (strain, mouse, day) of a table to its contiguous rows.
+
+    The table must be sorted by strain, mouse and day, as returned by
+    ``load_intervals``.  The index is built in a single pass over the
+    labels; a lookup is a binary search over the sorted mouse-day keys,
+    and returns slices of the table rather than copies.
+
+    parameters
+        table: pandas.DataFrame with columns strain, mouse and day
+        columns: columns gathered into the ``values`` array,
+            by default start and stop
+    """
+
+    def __init__(self, table, columns=("start", "stop")):
+        self.table = table
+        labels = np.asarray(table[LABELS].values, dtype=np.int64)
+        self.values = np.ascontiguousarray(table[list(columns)].values)
+        self.values.setflags(write=False)
+        self.columns = list(columns)
+        # rows where the mouse-day changes
+        breaks = np.flatnonzero((labels[1:] != labels[:-1]).any(axis=1)) + 1
+        self.starts = np.concatenate([[0], breaks]).astype(np.int64)
+        self.stops = np.concatenate([breaks, [len(labels)]]).astype(np.int64)
+        if len(labels) == 0:
+            self.starts = self.stops = np.zeros(0, dtype=np.int64)
+        self.keys = labels[self.starts]
+        self._radix = self.keys.max(axis=0) + 1 if len(self.keys) else \
+            np.ones(3, dtype=np.int64)
+        self._codes = self._encode(self.keys)
+        if np.any(np.diff(self._codes) <= 0):
+            raise ValueError("table must be sorted by strain, mouse and day")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        start, stop = self.rows(*key)
+        return stop > start
+
+    @property
+    def nbytes(self):
+        return (nbytes(self.table) + self.values.nbytes + self.keys.nbytes +
+                self.starts.nbytes + self.stops.nbytes + self._codes.nbytes)
+
+    def _encode(self, keys):
+        keys = np.atleast_2d(keys)
+        return (keys[:, 0] * self._radix[1] + keys[:, 1]) * self._radix[2] + \
+            keys[:, 2]
+
+    def rows(self, strain, mouse, day):
+        """ start and stop rows of a mouse-day; (0, 0) if it is absent """
+        key = np.array([strain, mouse, day], dtype=np.int64)
+        if np.any(key < 0) or np.any(key >= self._radix):
+            return 0, 0
+        code = self._encode(key)[0]
+        pos = self._codes.searchsorted(code)
+        if pos == len(self._codes) or self._codes[pos] != code:
+            return 0, 0
+        return int(self.starts[pos]), int(self.stops[pos])
+
+    def get(self, strain, mouse, day):
+        """ (n x len(columns)) read-only view of the values of a mouse-day """
+        start, stop = self.rows(strain, mouse, day)
+        return self.values[start:stop]
+
+    def frame(self, strain, mouse, day):
+        """ rows of the table belonging to a mouse-day """
+        start, stop = self.rows(strain, mouse, day)
+        return self.table.iloc[start:stop]
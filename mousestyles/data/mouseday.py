@@ -0,0 +1,152 @@
+"""Lazy handle on the movement data of one mouse-day."""
+
+from __future__ import print_function, absolute_import, division
+
+import numpy as np
+import pandas as pd
+
+from mousestyles.data import store as _store
+from mousestyles.data.catalog import get_catalog
+from mousestyles.data.derived import DerivedStore, open_derived
+
+COLUMNS = ["t", "x", "y", "isHB"]
+DERIVED_COLUMNS = ["dist", "dt", "speed", "heading"]
+
+
+def _check_mouseday(strain, mouse, day):
+    """ check if all inputs are nonnegative integers """
+    conditions_value = [strain < 0, mouse < 0, day < 0]
+    conditions_type = [type(strain) != int, type(mouse) != int,
+                       type(day) != int]
+    if any(conditions_value):
+        raise ValueError("Input values need to be nonnegative")
+    if any(conditions_type):
+        raise TypeError("Input values need to be integer")
+
+
+class MouseDay(object):
+    """ Movement data of one mouse-day, read column by column on demand.
+
+    Nothing is read when the object is created.  The t, x and y columns
+    are memory-mapped from the packed store (see ``pack_movement``), or
+    from the per-day files when they have changed since they were packed,
+    on first access; isHB is computed on first access.  The derived
+    columns below are computed once and kept on the object, and are
+    read-only.  They are read from the derived column store (see
+    ``mousestyles.data.derived``) when they were saved there, e.g. by
+    ``precompute_derived``, and only computed otherwise:
+
+    dist: distance between samples i and i + 1
+    dt: time between samples i and i + 1
+    speed: dist / dt
+    heading: direction of the step from sample i to sample i + 1, in
+        radians counterclockwise from the x axis
+
+    A MouseDay can be used where a movement DataFrame is read column by
+    column, e.g. ``movement['t']``; ``to_frame`` builds the DataFrame of
+    ``load_movement``.
+
+    parameters
+        strain, mouse, day: nonnegative integers
+        derived: by default, the derived columns saved in the shared
+            store of ``data/derived`` are read, and the others computed
+            in memory; True also saves the computed ones to the shared
+            store, a DerivedStore reads from and saves to that store, and
+            None always computes them in memory
+    """
+
+    def __init__(self, strain, mouse, day, derived=False):
+        _check_mouseday(strain, mouse, day)
+        self.strain, self.mouse, self.day = strain, mouse, day
+        # the store read from, and whether computed columns are saved
+        self._save = derived is True or isinstance(derived, DerivedStore)
+        if derived is True or derived is False:
+            derived = open_derived()
+        self._derived = derived if isinstance(derived, DerivedStore) \
+            else None
+        store = _store.open_store()
+        self._store = store if store is not None and \
+            store.is_current(strain, mouse, day) else None
+        if self._store is None and (strain, mouse, day) not in get_catalog():
+            raise ValueError("No data exists for strain {}, mouse {}, day {}".
+                             format(strain, mouse, day))
+        self._columns = {}
+
+    def __repr__(self):
+        return "MouseDay(strain={}, mouse={}, day={})".format(
+            self.strain, self.mouse, self.day)
+
+    def __len__(self):
+        return self["t"].shape[0]
+
+    def __contains__(self, name):
+        return name in COLUMNS + DERIVED_COLUMNS
+
+    def keys(self):
+        """ names of the columns and of the derived columns """
+        return COLUMNS + DERIVED_COLUMNS
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            if name in COLUMNS:
+                self._columns[name] = self._read(name)
+            elif name in DERIVED_COLUMNS:
+                compute = getattr(self, "_compute_" + name)
+                key = (self.strain, self.mouse, self.day)
+                if self._derived is None:
+                    value = compute()
+                elif self._save:
+                    value = self._derived.get(name, *key,
+                                              compute=compute)[0]
+                else:
+                    value = self._derived.load(name, *key)
+                    if value is None:
+                        value = compute()
+                value.setflags(write=False)
+                self._columns[name] = value
+            else:
+                raise KeyError(name)
+        return self._columns[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name not in COLUMNS + DERIVED_COLUMNS:
+            raise AttributeError(name)
+        return self[name]
+
+    def loaded(self):
+        """ names of the columns read or computed so far """
+        return sorted(self._columns)
+
+    def to_frame(self, columns=COLUMNS):
+        """ pandas.DataFrame of the given columns (by default t, x, y
+            and isHB, as returned by ``load_movement``) """
+        return pd.DataFrame(dict((name, self[name]) for name in columns),
+                            columns=list(columns))
+
+    def _read(self, name):
+        if self._store is not None:
+            txy, HB = self._store.get(self.strain, self.mouse, self.day)
+            return HB if name == "isHB" else txy[COLUMNS.index(name)]
+        path = _store._raw_paths(self.strain, self.mouse, self.day)[
+            COLUMNS.index(name)]
+        if name == "isHB":
+            return ~ np.load(path)
+        return np.load(path, mmap_mode="r")
+
+    def _steps(self):
+        return np.diff(self["x"]), np.diff(self["y"])
+
+    def _compute_dist(self):
+        dx, dy = self._steps()
+        return np.sqrt(dx ** 2 + dy ** 2)
+
+    def _compute_dt(self):
+        return np.diff(self["t"])
+
+    def _compute_speed(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self["dist"] / self["dt"]
+
+    def _compute_heading(self):
+        dx, dy = self._steps()
+        return np.arctan2(dy, dx)
@@ -0,0 +1,224 @@
+"""Packed columnar store for the ``txy_coords`` movement data.
+
+The raw movement data is spread over one ``.npy`` file per column and
+mouse-day (CT, CX, CY and C_idx_HB).  ``pack_movement`` is a one-time step
+that concatenates every mouse-day into a single binary file laid out column
+by column, and writes an offset index keyed by (strain, mouse, day):
+
+    movement.bin        t[0:N], x[0:N], y[0:N] (float64), isHB[0:N] (bool)
+    movement_index.npy  strain, mouse, day, start, stop for each mouse-day,
+                        and the size and mtime of its four raw files
+
+``MovementStore`` memory-maps that file, so that the columns of one
+mouse-day are zero-copy slices of the packed arrays.  A mouse-day whose
+raw files have changed since it was packed is no longer current, and is
+read from the raw files instead.
+"""
+
+from __future__ import print_function, absolute_import, division
+
+import os as _os
+
+import numpy as np
+
+from mousestyles import data_dir
+
+PACKED_DIR = _os.path.join(data_dir, "txy_coords", "packed")
+DATA_FILE = "movement.bin"
+INDEX_FILE = "movement_index.npy"
+
+INDEX_DTYPE = np.dtype([("strain", np.int64), ("mouse", np.int64),
+                        ("day", np.int64), ("start", np.int64),
+                        ("stop", np.int64), ("size", np.int64, (4,)),
+                        ("mtime", np.float64, (4,))])
+
+
+def _parse_mouseday(file_name):
+    """
+    Return the (strain, mouse, day) triple encoded in a data file name
+    such as ``CT_strain0_mouse1_day2.npy``.
+    """
+    strain = int(file_name.split("strain")[1].split("_mouse")[0])
+    mouse = int(file_name.split("mouse")[1].split("_day")[0])
+    day = int(file_name.split("day")[1].split(".npy")[0])
+    return strain, mouse, day
+
+
+def _raw_paths(strain, mouse, day):
+    """Return the paths of the four raw column files of one mouse-day."""
+    suffix = "strain{}_mouse{}_day{}.npy".format(strain, mouse, day)
+    return [_os.path.join(data_dir, "txy_coords", column,
+                          "{}_{}".format(column, suffix))
+            for column in ("CT", "CX", "CY", "C_idx_HB")]
+
+
+def _raw_stats(strain, mouse, day):
+    """
+    Return the sizes and modification times of the four raw column
+    files of one mouse-day.
+    """
+    stats = [_os.stat(item) for item in _raw_paths(strain, mouse, day)]
+    return ([stat.st_size for stat in stats],
+            [stat.st_mtime for stat in stats])
+
+
+def pack_movement(path=None):
+    """
+    Pack every mouse-day of the ``txy_coords`` tree into a single
+    columnar file with an offset index.
+
+    The packed store is written once and is then used transparently
+    by ``mousestyles.data.load_movement``.  Running it again overwrites
+    the previous store.
+
+    Parameters
+    ----------
+    path: str, optional
+        directory in which to write the store, defaults to
+        ``data/txy_coords/packed``
+
+    Returns
+    -------
+    index : numpy.ndarray
+        structured array with fields strain, mouse, day, start, stop,
+        size and mtime; rows ``start:stop`` of the packed columns hold
+        that mouse-day, packed from raw files of the given sizes and
+        modification times
+
+    Examples
+    --------
+    >>> index = pack_movement()
+    >>> store = MovementStore()
+    >>> movement = store.get(0, 0, 0)
+    """
+    if path is None:
+        path = PACKED_DIR
+    file_names = _os.listdir(_os.path.join(data_dir, "txy_coords", "CT"))
+    keys = sorted(_parse_mouseday(item) for item in file_names
+                  if item.endswith(".npy"))
+    if len(keys) == 0:
+        raise ValueError("Directory is empty; no file found.")
+    # first pass: read only the headers to lay out the offsets
+    lengths = [np.load(_raw_paths(*key)[0], mmap_mode="r").shape[0]
+               for key in keys]
+    stops = np.cumsum(lengths)
+    index = np.zeros(len(keys), dtype=INDEX_DTYPE)
+    index["strain"], index["mouse"], index["day"] = np.array(keys).T
+    index["start"] = stops - lengths
+    index["stop"] = stops
+    for row, key in zip(index, keys):
+        row["size"], row["mtime"] = _raw_stats(*key)
+    total = int(stops[-1])
+
+    if not _os.path.isdir(path):
+        _os.makedirs(path)
+    # second pass: copy each column into its slot of the packed file
+    txy = np.memmap(_os.path.join(path, DATA_FILE), dtype=np.float64,
+                    mode="w+", shape=(3, total))
+    for row, key in zip(index, keys):
+        CT, CX, CY = [np.load(item) for item in _raw_paths(*key)[:3]]
+        txy[0, row["start"]:row["stop"]] = CT
+        txy[1, row["start"]:row["stop"]] = CX
+        txy[2, row["start"]:row["stop"]] = CY
+    txy.flush()
+    del txy
+    HB = np.memmap(_os.path.join(path, DATA_FILE), dtype=np.bool_,
+                   mode="r+", offset=3 * 8 * total, shape=(total,))
+    for row, key in zip(index, keys):
+        HB[row["start"]:row["stop"]] = ~ np.load(_raw_paths(*key)[3])
+    HB.flush()
+    del HB
+    # the index is written last, so that a store is only picked up
+    # once its data file is complete
+    np.save(_os.path.join(path, INDEX_FILE), index)
+    return index
+
+
+class MovementStore(object):
+    """ Read-only, memory-mapped view of a packed movement store.
+
+    parameters
+        path: directory written by ``pack_movement``
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = PACKED_DIR
+        self.path = path
+        self.index = np.load(_os.path.join(path, INDEX_FILE))
+        total = int(self.index["stop"][-1]) if len(self.index) else 0
+        data_path = _os.path.join(path, DATA_FILE)
+        self.txy = np.memmap(data_path, dtype=np.float64, mode="r",
+                             shape=(3, total))
+        self.isHB = np.memmap(data_path, dtype=np.bool_, mode="r",
+                              offset=3 * 8 * total, shape=(total,))
+        self._rows = dict(((int(row["strain"]), int(row["mouse"]),
+                            int(row["day"])), (int(row["start"]),
+                                               int(row["stop"])))
+                          for row in self.index)
+        self._positions = dict(((int(row["strain"]), int(row["mouse"]),
+                                 int(row["day"])), position)
+                               for position, row in enumerate(self.index))
+
+    def __contains__(self, key):
+        return tuple(key) in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def keys(self):
+        """ (strain, mouse, day) triples in the store, sorted """
+        return sorted(self._rows)
+
+    def rows(self, strain, mouse, day):
+        """ start and stop offsets of a mouse-day in the packed columns """
+        try:
+            return self._rows[(strain, mouse, day)]
+        except KeyError:
+            raise ValueError("No data exists for strain {}, mouse {}, day {}".
+                             format(strain, mouse, day))
+
+    def is_current(self, strain, mouse, day):
+        """ whether a mouse-day is in the store and its raw files are
+            unchanged since it was packed """
+        if (strain, mouse, day) not in self._rows:
+            return False
+        # stores packed before the raw files were recorded are not trusted
+        if "size" not in self.index.dtype.names:
+            return False
+        row = self.index[self._positions[(strain, mouse, day)]]
+        try:
+            sizes, mtimes = _raw_stats(strain, mouse, day)
+        except OSError:
+            return False
+        return list(row["size"]) == sizes and list(row["mtime"]) == mtimes
+
+    def get(self, strain, mouse, day):
+        """ Return a (3 x n) view of t, x, y and the isHB view of a
+            mouse-day.  Neither array is a copy. """
+        start, stop = self.rows(strain, mouse, day)
+        return self.txy[:, start:stop], self.isHB[start:stop]
+
+
+_stores = {}
+
+
+def open_store(path=None):
+    """
+    Return the ``MovementStore`` at `path`, or None if no store has been
+    packed there.  Stores are opened once and reused until their index
+    file changes; use ``MovementStore.is_current`` to check that a
+    mouse-day's raw files have not changed since it was packed.
+    """
+    if path is None:
+        path = PACKED_DIR
+    index_path = _os.path.join(path, INDEX_FILE)
+    if not _os.path.exists(index_path):
+        _stores.pop(path, None)
+        return None
+    mtime = _os.path.getmtime(index_path)
+    cached = _stores.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, MovementStore(path))
+        _stores[path] = cached
+    return cached[1]
@@ -0,0 +1,42 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+
+from mousestyles.data.cache import LRUCache
+
+
+def test_lru_cache_hits_and_misses():
+    cache = LRUCache(max_bytes=1000)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return np.zeros(10)
+
+    first = cache.get("a", loader)
+    second = cache.get("a", loader)
+    assert first is second
+    assert len(calls) == 1
+    info = cache.info()
+    assert (info.hits, info.misses, info.entries) == (1, 1, 1)
+    assert info.nbytes == 80
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(max_bytes=200)
+    cache.put("a", np.zeros(10))
+    cache.put("b", np.zeros(10))
+    # touch "a" so that "b" is the least recently used entry
+    cache.get("a", lambda: None)
+    cache.put("c", np.zeros(10))
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.info().nbytes == 160
+    # values larger than the whole cache are never stored
+    cache.put("d", np.zeros(100))
+    assert "d" not in cache
+    cache.resize(100)
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0 and cache.info().nbytes == 0
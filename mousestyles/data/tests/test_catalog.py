@@ -0,0 +1,62 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import numpy as np
+import pytest
+
+from mousestyles.data import catalog
+
+
+def test_build_catalog():
+    cat = catalog.build_catalog(save=False)
+    assert len(cat) == 137
+    assert cat.strains() == [0, 1, 2]
+    assert cat.keys(0, 0)[:2] == [(0, 0, 0), (0, 0, 1)]
+    assert (1, 2, 3) in cat
+    info = cat.info(0, 0, 0)
+    assert info["samples"] == 39181
+    assert info["start_time"] < info["end_time"]
+    assert info["nbytes"] > 0
+    assert cat.interval_keys("AS") == cat.keys()
+    with pytest.raises(ValueError) as excinfo:
+        cat.info(1000, 1000, 1000)
+    expected = "No data exists for strain 1000, mouse 1000, day 1000"
+    assert excinfo.value.args[0] == expected
+
+
+def _write_mouseday(path, strain, mouse, day, n):
+    suffix = "strain{}_mouse{}_day{}.npy".format(strain, mouse, day)
+    for column in catalog.MOVEMENT_COLUMNS:
+        directory = os.path.join(path, "txy_coords", column)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        np.save(os.path.join(directory, "{}_{}".format(column, suffix)),
+                np.zeros(n))
+
+
+def test_get_catalog(tmpdir):
+    path = str(tmpdir)
+    _write_mouseday(path, 0, 0, 0, 10)
+    _write_mouseday(path, 0, 1, 0, 20)
+    cat = catalog.get_catalog(path)
+    assert cat.keys() == [(0, 0, 0), (0, 1, 0)]
+    assert cat.info(0, 1, 0)["samples"] == 20
+    assert np.isnan(cat.info(0, 1, 0)["start_time"])
+    assert os.path.exists(os.path.join(path, catalog.CATALOG_FILE))
+    assert catalog.get_catalog(path) is cat
+    # the saved catalog is used while the files are unchanged
+    catalog._catalogs.clear()
+    saved = catalog.get_catalog(path)
+    assert saved.keys() == cat.keys()
+    np.testing.assert_array_equal(saved.mousedays["samples"], [10, 20])
+    # and rebuilt once they change
+    _write_mouseday(path, 1, 0, 0, 5)
+    assert catalog.get_catalog(path).keys() == [(0, 0, 0), (0, 1, 0),
+                                                (1, 0, 0)]
+    # a file rewritten in place is picked up by build_catalog
+    _write_mouseday(path, 1, 0, 0, 7)
+    rebuilt = catalog.build_catalog(path)
+    assert catalog.get_catalog(path) is rebuilt
+    assert rebuilt.info(1, 0, 0)["samples"] == 7
@@ -4,8 +4,11 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import os
+
 import pytest
 
+from mousestyles import data_dir
 import mousestyles.data as data
 import numpy as np
 import pandas as pd
@@ -17,6 +20,20 @@ def test_all_features_loader():
     assert all_features.shape == (21131, 13)
 
 
+def test_all_features_layout():
+    # the rows are those of pd.melt on each feature
+    all_features = data.load_all_features()
+    raw = np.load(os.path.join(data_dir, 'all_features_mousedays_11bins.npy'))
+    columns = ['strain', 'mouse', 'day'] + list(range(0, 22, 2))
+    food = pd.melt(pd.DataFrame(raw[3], columns=columns),
+                   id_vars=columns[:3], value_vars=columns[3:],
+                   var_name='hour', value_name='Food')
+    pd.testing.assert_frame_equal(all_features[food.columns], food)
+    # every call returns its own copy
+    all_features['Food'] = 0
+    assert data.load_all_features()['Food'].equals(food['Food'])
+
+
 def test_mouseday_features_loader():
     # Checking load_mouseday_features returns a data frame of
     # the correct dimension
@@ -35,6 +52,30 @@ def test_intervals_loader():
     assert AS.shape == (1343, 5)
 
 
+def test_intervals_loader_order():
+    # Checking rows are sorted by mouse-day and match the per-day files
+    AS = data.load_intervals('AS')
+    keys = AS[['strain', 'mouse', 'day']].values
+    assert np.all(np.diff(keys[:, 0]) >= 0)
+    sub = AS[(AS['strain'] == 1) & (AS['mouse'] == 2) & (AS['day'] == 3)]
+    expected = np.load(os.path.join(data_dir, 'intervals', 'AS',
+                                    'AS_strain1_mouse2_day3.npy'))
+    np.testing.assert_array_equal(sub[['start', 'stop']].values, expected)
+
+
+def test_intervals_loader_cache():
+    # Checking load_intervals reads each feature once and hands out copies
+    data.intervals_cache.invalidate()
+    AS1 = data.load_intervals('AS')
+    misses = data.intervals_cache.info().misses
+    hits = data.intervals_cache.info().hits
+    AS2 = data.load_intervals('AS')
+    assert data.intervals_cache.info().misses == misses
+    assert data.intervals_cache.info().hits == hits + 1
+    assert AS1 is not AS2
+    assert np.all(AS1 == AS2)
+
+
 def test_movement_loader():
     # Checking load_movement returns a data frame of the correct dimension
     movement = data.load_movement(0, 0, 0)
@@ -128,6 +169,40 @@ def test_pos_bystrain():
     assert np.all(data.distances_bystrain(1, 2, 3) >= 0)
 
 
+def test_distances_binning():
+    # loop of the original implementation, for reference
+    movement = data.load_movement(1, 2, 3)
+    dist = np.sqrt(movement["x"].diff()[1:]**2 + movement["y"].diff()[1:]**2)
+    time = movement['t'][1:] - movement['t'][0]
+    aggregate = np.zeros(int(time[len(time)-1] / 100))
+    j = 1
+    for i in range(len(aggregate)):
+        while time[j] < i * 100:
+            aggregate[i] = aggregate[i] + dist[j]
+            j = j + 1
+    np.testing.assert_array_equal(data.distances(1, 2, 3, step=100),
+                                  aggregate)
+    # chunked reads give the same steps
+    np.testing.assert_array_equal(
+        data.distances(1, 2, 3, step=100, chunksize=1000), aggregate)
+    pieces = list(data.iter_distances(1, 2, 3, step=100, chunksize=1000))
+    assert len(pieces) > 1
+    np.testing.assert_array_equal(np.concatenate(pieces), aggregate)
+
+
+def test_distances_bystrain_workers():
+    days = data.list_mousedays(1, 2)
+    assert days == sorted(days) and len(days) > 0
+    assert all(key[:2] == (1, 2) for key in days)
+    expected = np.concatenate([data.distances(*key, step=100)
+                               for key in days])
+    np.testing.assert_array_equal(data.distances_bymouse(1, 2, step=100),
+                                  expected)
+    np.testing.assert_array_equal(
+        data.distances_bymouse(1, 2, step=100, workers=2), expected)
+    assert data.distances_bystrain(1000).size == 0
+
+
 def test_array_day():
     assert type(data.distances(1, 2, 3)) is np.ndarray
 
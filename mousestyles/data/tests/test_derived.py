@@ -0,0 +1,45 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import numpy as np
+
+from mousestyles.data import MouseDay
+from mousestyles.data.derived import DerivedStore, precompute_derived
+
+
+def test_derived_store(tmpdir):
+    store = DerivedStore(str(tmpdir))
+    assert ("dist", 0, 0, 0) not in store
+    dist = MouseDay(0, 0, 0, derived=store)["dist"]
+    assert ("dist", 0, 0, 0) in store
+    assert os.path.dirname(store.file("dist", 0, 0, 0)).endswith(
+        os.path.join("v1", "dist"))
+    # a new handle reads the saved column
+    saved = MouseDay(0, 0, 0, derived=store)["dist"]
+    assert isinstance(saved, np.memmap)
+    np.testing.assert_array_equal(saved, dist)
+    np.testing.assert_array_equal(
+        saved, MouseDay(0, 0, 0, derived=None)["dist"])
+    # files of another version of the derivations are not used
+    assert ("dist", 0, 0, 0) not in DerivedStore(str(tmpdir), version=2)
+
+
+def test_precompute_derived(tmpdir):
+    path = str(tmpdir)
+    keys = [(0, 0, 0), (1, 2, 3)]
+    assert precompute_derived(["dt", "speed"], keys, path=path) == 4
+    assert precompute_derived(["dt", "speed"], keys, path=path) == 0
+    store = DerivedStore(path)
+    assert ("speed", 1, 2, 3) in store
+
+
+def test_precompute_derived_unwritable(tmpdir):
+    # the store cannot be created below a file
+    path = tmpdir.join("file")
+    path.write("")
+    assert precompute_derived(["dt"], [(0, 0, 0)], path=str(path)) == 0
+    value, written = DerivedStore(str(path)).get(
+        "dt", 0, 0, 0, lambda: np.zeros(3))
+    assert not written
@@ -0,0 +1,46 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pytest
+
+from mousestyles import data
+
+
+def test_feature_tensor_views():
+    tensor = data.load_feature_tensor()
+    assert tensor.shape == (9, 1921, 11)
+    assert tensor.dims == ("feature", "mouseday", "bin")
+    assert not tensor.values.flags.writeable
+    # selections by range are views of the same memory
+    food = tensor.sel(feature="Food", strain=1, bin=[0, 2, 4])
+    assert food.shape == (1, (tensor.labels[:, 0] == 1).sum(), 3)
+    assert np.shares_memory(food.values, tensor.values)
+    assert not food.values.flags.writeable
+    # copies are writable and independent
+    copy = food.copy()
+    copy.values[:] = 0
+    assert food.values.any()
+
+
+def test_feature_tensor_sel():
+    tensor = data.load_feature_tensor()
+    sel = tensor.sel(feature=["Water", "Food"], mouse=[1, 3], day=5)
+    assert sel.features == ["Water", "Food"]
+    assert set(sel.labels[:, 1]) == set([1, 3])
+    assert set(sel.labels[:, 2]) == set([5])
+    np.testing.assert_array_equal(
+        sel.values[1], tensor.sel(feature="Food", mouse=[1, 3], day=5)
+        .values[0])
+    with pytest.raises(ValueError):
+        tensor.sel(feature="Sleep")
+    with pytest.raises(ValueError):
+        tensor.sel(bin=3)
+
+
+def test_feature_tensor_frame():
+    tensor = data.load_feature_tensor().sel(feature=["Food", "Water"])
+    frame = tensor.to_frame()
+    assert frame.equals(data.load_mouseday_features(["Food", "Water"]))
+    assert list(frame.columns[3:5]) == ["Food_0", "Food_2"]
+    np.testing.assert_array_equal(frame.values[:, 3:], tensor.to_matrix())
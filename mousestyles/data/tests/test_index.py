@@ -0,0 +1,49 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import mousestyles.data as data
+from mousestyles.data.index import MouseDayIndex
+
+
+def test_mouseday_index():
+    table = pd.DataFrame({'strain': [0, 0, 0, 1, 1],
+                          'mouse': [0, 0, 1, 0, 0],
+                          'day': [0, 0, 3, 2, 2],
+                          'start': [1., 3., 5., 7., 9.],
+                          'stop': [2., 4., 6., 8., 10.]})
+    index = MouseDayIndex(table)
+    assert len(index) == 3
+    np.testing.assert_array_equal(index.keys, [[0, 0, 0], [0, 1, 3],
+                                               [1, 0, 2]])
+    assert index.rows(0, 1, 3) == (2, 3)
+    np.testing.assert_array_equal(index.get(1, 0, 2), [[7., 8.], [9., 10.]])
+    assert index.frame(0, 0, 0).shape == (2, 5)
+    # absent mouse-days give empty slices
+    assert index.get(0, 0, 1).shape == (0, 2)
+    assert index.get(5, 0, 0).shape == (0, 2)
+    assert (0, 1, 3) in index
+    assert (0, 1, 2) not in index
+    # the values are shared, not copied
+    assert not index.get(0, 0, 0).flags.owndata
+
+
+def test_mouseday_index_unsorted():
+    table = pd.DataFrame({'strain': [1, 0], 'mouse': [0, 0], 'day': [0, 0],
+                          'start': [1., 3.], 'stop': [2., 4.]})
+    with pytest.raises(ValueError) as excinfo:
+        MouseDayIndex(table)
+    expected = "table must be sorted by strain, mouse and day"
+    assert excinfo.value.args[0] == expected
+
+
+def test_load_intervals_index():
+    AS = data.load_intervals('AS')
+    index = data.load_intervals_index('AS')
+    assert len(index) == 137
+    mask = (AS['strain'] == 1) & (AS['mouse'] == 2) & (AS['day'] == 3)
+    np.testing.assert_array_equal(index.get(1, 2, 3),
+                                  AS[mask][['start', 'stop']].values)
@@ -0,0 +1,49 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pytest
+
+from mousestyles import data
+from mousestyles.data import MouseDay
+
+
+def test_mouseday_columns():
+    movement = MouseDay(0, 0, 0)
+    assert movement.loaded() == []
+    assert len(movement) == 39181
+    assert movement.loaded() == ["t"]
+    frame = data.load_movement(0, 0, 0)
+    np.testing.assert_array_equal(movement["x"], frame["x"])
+    np.testing.assert_array_equal(movement.isHB, frame["isHB"])
+    assert movement.to_frame().equals(frame)
+    with pytest.raises(KeyError):
+        movement["z"]
+
+
+def test_mouseday_derived():
+    movement = MouseDay(0, 0, 0)
+    frame = data.load_movement(0, 0, 0)
+    dist = np.sqrt(frame["x"].diff() ** 2 + frame["y"].diff() ** 2)
+    np.testing.assert_array_equal(movement["dist"], dist.values[1:])
+    np.testing.assert_array_equal(movement["dt"], np.diff(frame["t"]))
+    np.testing.assert_allclose(movement["speed"][1:10],
+                               (dist / frame["t"].diff()).values[2:11])
+    step = np.array([np.cos(movement.heading), np.sin(movement.heading)])
+    np.testing.assert_allclose(step[:, 1:10] * movement.dist[1:10],
+                               [np.diff(frame["x"])[1:10],
+                                np.diff(frame["y"])[1:10]], atol=1e-9)
+    # derived columns are computed once and cannot be modified
+    assert movement["dist"] is movement["dist"]
+    assert not movement["dist"].flags.writeable
+
+
+def test_mouseday_input():
+    with pytest.raises(ValueError) as excinfo:
+        MouseDay(1000, 1000, 1000)
+    expected = "No data exists for strain 1000, mouse 1000, day 1000"
+    assert excinfo.value.args[0] == expected
+    with pytest.raises(ValueError):
+        MouseDay(-1, 0, 0)
+    with pytest.raises(TypeError):
+        MouseDay(0.5, 0, 0)
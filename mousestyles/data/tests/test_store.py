@@ -0,0 +1,66 @@
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import os
+
+import numpy as np
+import pytest
+
+from mousestyles import data
+from mousestyles.data import store
+
+
+def test_pack_movement(tmpdir):
+    path = str(tmpdir)
+    index = store.pack_movement(path)
+    assert index.shape == (137,)
+    assert np.all(index["start"][1:] == index["stop"][:-1])
+
+    packed = store.MovementStore(path)
+    assert len(packed) == 137
+    assert (0, 0, 0) in packed
+    txy, HB = packed.get(0, 0, 0)
+    assert txy.shape == (3, 39181)
+    assert HB.shape == (39181,)
+    CT = np.load(store._raw_paths(0, 0, 0)[0])
+    NHB = np.load(store._raw_paths(0, 0, 0)[3])
+    np.testing.assert_array_equal(txy[0], CT)
+    np.testing.assert_array_equal(HB, ~NHB)
+    # slices of the store are views, not copies
+    assert not txy.flags.owndata
+
+    with pytest.raises(ValueError) as excinfo:
+        packed.get(1000, 1000, 1000)
+    expected = "No data exists for strain 1000, mouse 1000, day 1000"
+    assert excinfo.value.args[0] == expected
+
+
+def test_open_store(tmpdir):
+    path = str(tmpdir)
+    assert store.open_store(path) is None
+    store.pack_movement(path)
+    assert store.open_store(path) is store.open_store(path)
+
+
+def test_store_is_current(tmpdir, monkeypatch):
+    path = str(tmpdir)
+    store.pack_movement(path)
+    monkeypatch.setattr(store, "PACKED_DIR", path)
+    packed = store.open_store()
+    assert packed.is_current(0, 0, 0)
+    assert not packed.is_current(1000, 1000, 1000)
+    movement = data.load_movement(0, 0, 0)
+    assert np.shares_memory(movement["t"].values, packed.txy)
+    # a mouse-day whose raw files changed is read from those files
+    CT_path = store._raw_paths(0, 0, 0)[0]
+    stat = os.stat(CT_path)
+    try:
+        os.utime(CT_path, (stat.st_atime, stat.st_mtime + 10))
+        assert not packed.is_current(0, 0, 0)
+        assert packed.is_current(0, 0, 1)
+        movement = data.load_movement(0, 0, 0)
+        assert not np.shares_memory(movement["t"].values, packed.txy)
+        np.testing.assert_array_equal(movement["t"], np.load(CT_path))
+    finally:
+        os.utime(CT_path, (stat.st_atime, stat.st_mtime))
+    assert packed.is_current(0, 0, 0)
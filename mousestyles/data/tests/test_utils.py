@@ -1,9 +1,15 @@
 from __future__ import print_function, absolute_import, division
 
 import numpy as np
+import pytest
 
 from mousestyles.data.utils import (pull_locom_tseries_subset,
-                                    total_time_rectangle_bins)
+                                    pull_locom_tseries_windows,
+                                    total_time_rectangle_bins,
+                                    total_time_rectangle_bins_mousedays,
+                                    idx_restrict_to_rectangles,
+                                    GroupBy, day_to_mouse_average,
+                                    mouse_to_strain_average)
 
 
 def test_pull_locom():
@@ -33,6 +39,26 @@ def test_pull_locom():
     np.testing.assert_allclose(Mnew, M)
 
 
+def test_pull_locom_windows():
+    M = np.array([[1, 2, 3, 4, 5, 6], [8, 7, 6, 5, 5, 4], [-1, 3, 4, 1, 1, 4]])
+    starts = [1, 1, 1.2, 0, 1.2, 1]
+    stops = [4, 3.4, 3.4, 5, 1.5, 7]
+    windows = pull_locom_tseries_windows(M, starts, stops)
+    assert len(windows) == 6
+    for k, window in enumerate(windows):
+        np.testing.assert_allclose(
+            window, pull_locom_tseries_subset(M, starts[k], stops[k]))
+    np.testing.assert_array_equal(windows.lengths, [4, 4, 4, 5, 2, 6])
+    np.testing.assert_array_equal(windows.has_head,
+                                  [0, 0, 1, 0, 1, 0])
+    np.testing.assert_array_equal(windows.has_tail,
+                                  [0, 1, 1, 0, 1, 0])
+    np.testing.assert_allclose(windows.head[:, 2], [1.2, 8, -1])
+    # the events of the windows are views of M
+    assert windows.view(1).base is M
+    np.testing.assert_array_equal(windows.view(1), M[:, :3])
+
+
 def test_total_time():
     M = np.array([[1, 2, 3], [.5, .1, .1], [.3, .4, .6]])
     TT = total_time_rectangle_bins(M, xbins=2, ybins=2)
@@ -54,3 +80,69 @@ def test_total_time():
     TT = total_time_rectangle_bins(M, xbins=3, ybins=5)
     np.testing.assert_allclose(TT, [[0., 0., 0.], [0., 0., 0.],
                                     [0., 0., 0.], [0., 1., 0.], [0., 0., 0.]])
+
+
+def test_total_time_mousedays():
+    Ms = [np.array([[1, 2, 3], [.5, .1, .1], [.3, .4, .6]]),
+          np.array([[1, 2], [.5, .5], [.3, .3]]),
+          np.array([[1, 2, 3, 4, 5, 6],
+                    [.51, .61, .11, 1.81, -.21, .3],
+                    [.3, .41, .6, .1, 1.1, .1]])]
+    TT = total_time_rectangle_bins_mousedays(Ms, xbins=3, ybins=5)
+    assert TT.shape == (3, 5, 3)
+    for M, T in zip(Ms, TT):
+        np.testing.assert_allclose(
+            T, total_time_rectangle_bins(M, xbins=3, ybins=5))
+    np.testing.assert_allclose(TT.sum(axis=(1, 2)), [2, 1, 5])
+    assert total_time_rectangle_bins_mousedays([], xbins=3).shape == \
+        (0, 10, 3)
+
+
+def test_idx_restrict_to_rectangles():
+    # the cage is split in 2 columns of width 10 and 4 rows of height 10.5
+    TXY = np.array([[1, 2, 3, 4, 5, 6, 7],
+                    [-10, -10, 0, 0, -6.25, -16.25, 0],
+                    [40, 30, 40, 10, 35, 40, np.nan]])
+    idx = idx_restrict_to_rectangles(TXY, rects=[(0, 0)])
+    np.testing.assert_array_equal(idx, [1, 0, 0, 0, 0, 0, 0])
+    idx, ids = idx_restrict_to_rectangles(
+        TXY, rects=[(3, 1), (0, 1), (0, 0)], return_ids=True, chunksize=3)
+    np.testing.assert_array_equal(ids, [2, -1, 1, 0, -1, -1, -1])
+    np.testing.assert_array_equal(idx, ids >= 0)
+
+
+def test_groupby():
+    keys = np.array([[1, 0], [0, 1], [1, 0], [0, 0], [0, 1]])
+    values = np.array([[1., 2.], [3., 4.], [5., 6.], [7., 8.], [9., 10.]])
+    groups = GroupBy(keys)
+    np.testing.assert_array_equal(groups.keys, [[0, 0], [0, 1], [1, 0]])
+    np.testing.assert_array_equal(groups.count, [1, 2, 2])
+    np.testing.assert_array_equal(groups.group, [2, 1, 2, 0, 1])
+    np.testing.assert_allclose(groups.sum(values),
+                               [[7, 8], [12, 14], [6, 8]])
+    np.testing.assert_allclose(groups.reduce(values, np.maximum),
+                               [[7, 8], [9, 10], [5, 6]])
+    with pytest.raises(TypeError):
+        groups.reduce(values, np.median)
+    mean, std, stderr, count = groups.aggregate(values)
+    np.testing.assert_allclose(mean, [[7, 8], [6, 7], [3, 4]])
+    np.testing.assert_allclose(std, [[0, 0], [3, 3], [2, 2]])
+    np.testing.assert_allclose(stderr[1:], [[3, 3], [2, 2]])
+    assert np.isnan(stderr[0]).all()
+    np.testing.assert_allclose(groups.std(values, ddof=1)[1:],
+                               np.sqrt(2) * std[1:])
+
+
+def test_mouse_strain_average():
+    labels = np.array([[1, 0, 0], [0, 1, 0], [1, 0, 1], [0, 1, 1],
+                       [0, 0, 0], [0, 0, 2], [2, 0, 0]])
+    features = np.array([[1.], [2.], [3.], [4.], [5.], [6.], [7.]])
+    mice, stderr = day_to_mouse_average(features, labels, num_strains=2,
+                                        stderr=True)
+    np.testing.assert_allclose(mice, [[0, 0, 5.5], [0, 1, 3], [1, 0, 2]])
+    np.testing.assert_allclose(stderr, [[0, 0, .5], [0, 1, 1], [1, 0, 1]])
+    strains, std = mouse_to_strain_average(mice[:, 2:], mice[:, :2],
+                                           num_strains=3, stdev=True)
+    np.testing.assert_allclose(strains[:2], [[4.25], [2]])
+    np.testing.assert_allclose(std[:2], [[1.25], [0]])
+    assert np.isnan(strains[2]).all()
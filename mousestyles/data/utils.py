@@ -5,6 +5,94 @@ from __future__ import print_function, absolute_import, division
 import numpy as np
 
 
+class GroupBy(object):
+    """
+    Rows of an array grouped by the values of their key columns, e.g. the
+    (strain, mouse) labels of mouse days, to aggregate every column of
+    the rows in one pass.
+
+    The rows are sorted once by their keys, so that each group is a
+    contiguous segment and a reduction over all the groups is a single
+    ``ufunc.reduceat``; the same GroupBy can aggregate many arrays with
+    the same rows.  Groups are in the lexicographic order of their keys.
+
+    parameters
+        keys: (M,) or (M x K) array of the keys of the M rows
+
+    attributes
+        keys: (G x K) array of the keys of the G groups
+        count: (G,) array of the number of rows of each group
+        group: (M,) array of the group of each row
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys)
+        if keys.ndim == 1:
+            keys = keys.reshape((-1, 1))
+        # stable sort on the first key, then on the second, ...
+        self._order = np.lexsort(keys.T[::-1])
+        sorted_keys = keys[self._order]
+        first = np.ones(keys.shape[0], dtype=bool)
+        first[1:] = (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)
+        self._starts = np.flatnonzero(first)
+        self.keys = sorted_keys[self._starts]
+        self.count = np.diff(np.append(self._starts, keys.shape[0]))
+        self.group = np.empty(keys.shape[0], dtype=np.intp)
+        self.group[self._order] = np.cumsum(first) - 1
+
+    def __len__(self):
+        return self.keys.shape[0]
+
+    def _per_group(self, array, values):
+        """ array of one value per group, shaped to broadcast against
+            the reductions of values """
+        return array.reshape((-1,) + (1,) * (np.ndim(values) - 1))
+
+    def reduce(self, values, func=np.add):
+        """ Reduce the rows of values over each group with func, a binary
+            ufunc, e.g. np.add for sums or np.maximum for maxima; other
+            functions would need a loop over the groups and raise a
+            TypeError.  Use mean, std or aggregate for those. """
+        if not isinstance(func, np.ufunc):
+            raise TypeError("func should be a ufunc, e.g. np.add")
+        values = np.asarray(values)[self._order]
+        if len(self) == 0:
+            return np.zeros((0,) + values.shape[1:], dtype=values.dtype)
+        return func.reduceat(values, self._starts, axis=0)
+
+    def sum(self, values):
+        """ sum of the rows of values over each group """
+        return self.reduce(values)
+
+    def mean(self, values):
+        """ mean of the rows of values over each group """
+        return self.sum(values) / self._per_group(self.count, values)
+
+    def std(self, values, ddof=0):
+        """ standard deviation of the rows of values over each group """
+        return self.aggregate(values, ddof=ddof)[1]
+
+    def aggregate(self, values, ddof=0):
+        """
+        mean, standard deviation, standard error and count of the rows
+        of values over each group; the standard error is
+        std / sqrt(count - 1), and is nan for groups of a single row
+        """
+        values = np.asarray(values)
+        count = self._per_group(self.count, values)
+        mean = self.sum(values) / count
+        deviations = values - mean[self.group]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.sqrt(self.sum(deviations ** 2) / (count - ddof))
+            stderr = std / np.sqrt(count - 1)
+        return mean, std, stderr, self.count
+
+
+def _strains_mask(labels, num_strains):
+    """ rows of labels whose strain is one of 0, ..., num_strains - 1 """
+    return (labels[:, 0, None] == np.arange(num_strains)).any(axis=1)
+
+
 def day_to_mouse_average(features, labels, num_strains=16,
                          stdev=False, stderr=False):
     """
@@ -13,57 +101,20 @@ def day_to_mouse_average(features, labels, num_strains=16,
 
     Returns:
         new data matrix with a mean and stdev/stderr for each mouse over
-        mouse days
+        mouse days, ordered by strain and mouse
     """
+    features, labels = np.asarray(features), np.asarray(labels)
+    keep = _strains_mask(labels, num_strains)
+    mice = GroupBy(labels[keep, :2])
+    mean, std, sem, _ = mice.aggregate(features[keep])
 
-    data = np.hstack([labels, features])
-    tot_data_avgs = np.zeros((1, data.shape[1] - 1))
-    tot_data_std = np.zeros((1, data.shape[1] - 1))
-    tot_data_stderr = np.zeros((1, data.shape[1] - 1))
-
-    for strain in range(0, num_strains):
-        mice = {}
-        cnt = 0
-        tmp_data = data[data[:, 0] == strain, :]
-
-        for i in range(tmp_data.shape[0]):
-            if tmp_data[i, 1] in mice:
-                mice[tmp_data[i, 1]] += 1
-            else:
-                cnt += 1
-                mice[tmp_data[i, 1]] = 1
-        data_avgs = np.zeros((len(mice), data.shape[1] - 1))
-        data_std = np.zeros((len(mice), data.shape[1] - 1))
-        data_stderr = np.zeros((len(mice), data.shape[1] - 1))
-
-        for c, num in enumerate(mice.keys()):
-            mouse_arr = tmp_data[tmp_data[:, 1] == num, 0:]
-            mouse_avg = mouse_arr[:, 3:].mean(axis=0)
-            mouse_std = mouse_arr[:, 3:].std(axis=0)
-            # standard error for plot
-            mouse_stderr = mouse_arr[:, 3:].std(
-                axis=0) / np.sqrt(mouse_arr.shape[0] - 1)
-
-            data_avgs[c, 0:2] = mouse_arr[0, 0:2]
-            data_avgs[c, 2:] = mouse_avg
-
-            data_std[c, 0:2] = mouse_arr[0, 0:2]
-            data_std[c, 2:] = mouse_std
-
-            data_stderr[c, 0:2] = mouse_arr[0, 0:2]
-            data_stderr[c, 2:] = mouse_stderr
-
-        tot_data_avgs = np.vstack(
-            [tot_data_avgs, data_avgs])          # not ordered
-        tot_data_std = np.vstack([tot_data_std, data_std])
-        tot_data_stderr = np.vstack([tot_data_stderr, data_stderr])
-
+    tot_data_avgs = np.hstack([mice.keys, mean])
     if stdev:
-        return tot_data_avgs[1:], tot_data_std[1:]
+        return tot_data_avgs, np.hstack([mice.keys, std])
     elif stderr:
-        return tot_data_avgs[1:], tot_data_stderr[1:]
+        return tot_data_avgs, np.hstack([mice.keys, sem])
 
-    return tot_data_avgs[1:]
+    return tot_data_avgs
 
 
 def mouse_to_strain_average(
@@ -74,19 +125,18 @@ def mouse_to_strain_average(
     other columns are features
 
     Returns: new data matrix with a mean and stdev/stderr for each strain
-    over mice
+    over mice (nan for the strains without mice)
     """
-    data = np.hstack([labels, features])
-    tot_data_avgs = np.zeros((num_strains, data.shape[1] - 2))
-    tot_data_std = np.zeros((num_strains, data.shape[1] - 2))
-    tot_data_stderr = np.zeros((num_strains, data.shape[1] - 2))
-
-    for strain in range(0, num_strains):
-        tmp_data = data[data[:, 0] == strain, 2:]
-        tot_data_avgs[strain] = tmp_data.mean(axis=0)
-        tot_data_std[strain] = tmp_data.std(axis=0)
-        tot_data_stderr[strain] = tmp_data.std(
-            axis=0) / np.sqrt(tmp_data.shape[0] - 1)  # standard error for plot
+    features, labels = np.asarray(features), np.asarray(labels)
+    keep = _strains_mask(labels, num_strains)
+    strains = GroupBy(labels[keep, 0])
+    rows = strains.keys[:, 0].astype(int)
+    tot_data = []
+    for stat in strains.aggregate(features[keep])[:3]:
+        full = np.full((num_strains,) + stat.shape[1:], np.nan)
+        full[rows] = stat
+        tot_data.append(full)
+    tot_data_avgs, tot_data_std, tot_data_stderr = tot_data
 
     if stdev:
         return tot_data_avgs, tot_data_std
@@ -153,89 +203,201 @@ def pull_locom_tseries_subset(M, start_time=0, stop_time=300):
      so we should artificially create start_time, stop_time movement events
      at boundries)
     """
-    T = M[0]
-    idx_start = T.searchsorted(start_time)
-    idx_stop = T.searchsorted(stop_time)
-    new_M = M[:, idx_start:idx_stop].copy()
-    if idx_stop != T.shape[0]:
-        if (idx_start != 0) and (T[idx_start] != start_time):
-            v = np.zeros(M.shape[0])
-            v[1:] = M[1:, idx_start - 1].copy()
-            v[0] = start_time
-            v = v.reshape((M.shape[0], 1))
-            new_M = np.hstack([v, new_M])
-        if (T[idx_stop] != stop_time) and (idx_stop != 0):
-            v = np.zeros(M.shape[0])
-            v[1:] = M[1:, idx_stop - 1].copy()  # find last time registered
-            v[0] = stop_time
-            v = v.reshape((M.shape[0], 1))
-            new_M = np.hstack([new_M, v])
-        elif (T[idx_stop] == stop_time):
-            v = M[:, idx_stop].copy().reshape((M.shape[0], 1))
-            new_M = np.hstack([new_M, v])
-    else:
-        pass
-    return new_M
+    return pull_locom_tseries_windows(M, [start_time], [stop_time])[0]
 
 
-def total_time_rectangle_bins(
-        M, xlims=(0, 1), ylims=(0, 1), xbins=5, ybins=10):
+class LocomWindows(object):
     """
-    given an (3 x n) numpy array M where the 0th row is array of times
-    [ASSUMED SORTED]
+    Windows [start_time, stop_time] of an (m x n) array M whose 0th row is
+    the array of times, as returned by pull_locom_tseries_subset for each
+    window, but found for all the windows at once and assembled only on
+    demand.
+
+    Window k is the view M[:, idx_start[k]:idx_stop[k]], preceded by the
+    column head[:, k] if has_head[k] and followed by the column tail[:, k]
+    if has_tail[k]; these boundary columns are the movement events
+    artificially created at start_time and stop_time, which hold the
+    position of the last event before them.
+
+    attributes
+        idx_start, idx_stop: (K,) int arrays of the bounds of the views
+        has_head, has_tail: (K,) bool arrays
+        head, tail: (m x K) float arrays of the boundary columns, only
+            meaningful where has_head or has_tail
+    """
+
+    def __init__(self, M, start_times, stop_times):
+        self.M = M
+        start_times = np.asarray(start_times, dtype=float).ravel()
+        stop_times = np.asarray(stop_times, dtype=float).ravel()
+        num_windows = start_times.shape[0]
+        T = M[0]
+        n = T.shape[0]
+
+        idx = T.searchsorted(np.concatenate([start_times, stop_times]))
+        self.idx_start, idx_stop = idx[:num_windows], idx[num_windows:]
+        # times of the events at the bounds, and columns of the last events
+        # before them
+        dtype = np.result_type(M.dtype, np.float64)
+        T_start, T_stop = np.zeros((2, num_windows))
+        self.head = np.zeros((M.shape[0], num_windows), dtype=dtype)
+        self.tail = np.zeros((M.shape[0], num_windows), dtype=dtype)
+        if n:
+            T_start[:] = T[np.minimum(self.idx_start, n - 1)]
+            T_stop[:] = T[np.minimum(idx_stop, n - 1)]
+            self.head[:] = M[:, np.maximum(self.idx_start - 1, 0)]
+            self.tail[:] = M[:, np.maximum(idx_stop - 1, 0)]
+        self.head[0] = start_times
+        self.tail[0] = stop_times
+
+        # nothing is added to the windows which end after the last event
+        inside = idx_stop != n
+        self.has_head = inside & (self.idx_start != 0) & \
+            (T_start != start_times)
+        # an event at stop_time itself closes the window ...
+        at_stop = inside & (T_stop == stop_times)
+        self.idx_stop = idx_stop + at_stop
+        # ... otherwise the last position is held until stop_time
+        self.has_tail = inside & ~at_stop & (idx_stop != 0)
+        # windows with stop_time < start_time hold no event of their own
+        self.idx_start = np.minimum(self.idx_start, idx_stop)
+
+    def __len__(self):
+        return self.idx_start.shape[0]
+
+    @property
+    def lengths(self):
+        """ number of columns of each window """
+        return self.idx_stop - self.idx_start + self.has_head + \
+            self.has_tail
+
+    def view(self, k):
+        """ events of window k, without the boundary columns (a view) """
+        return self.M[:, self.idx_start[k]:self.idx_stop[k]]
+
+    def __getitem__(self, k):
+        """ window k with its boundary columns (a copy) """
+        view = self.view(k)
+        head, tail = int(self.has_head[k]), int(self.has_tail[k])
+        dtype = self.head.dtype if head or tail else view.dtype
+        window = np.empty((view.shape[0], head + view.shape[1] + tail),
+                          dtype=dtype)
+        window[:, head:head + view.shape[1]] = view
+        if head:
+            window[:, 0] = self.head[:, k]
+        if tail:
+            window[:, -1] = self.tail[:, k]
+        return window
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+
+def pull_locom_tseries_windows(M, start_times, stop_times):
+    """
+    given an (m x n) numpy array M where the 0th row is array of times
+    [ASSUMED SORTED] and arrays of K start and stop times
+
+    returns a LocomWindows whose k-th window is
+    pull_locom_tseries_subset(M, start_times[k], stop_times[k]); all the
+    windows are located with a single searchsorted
+    """
+    return LocomWindows(M, start_times, stop_times)
 
-    returns a new (xbins x ybins) array (copy) that contains PDF of location
-    over time
+
+def _rectangle_bins(x, y, xlims, ylims, xbins, ybins):
+    """
+    flat index, row * xbins + column, of the rectangle bin of each (x, y)
+    point in the (ybins x xbins) grid of total_time_rectangle_bins, whose
+    first row is the top of the cage; points outside of the limits are
+    counted in the nearest bin
     """
     xmin, xmax = xlims
     ymin, ymax = ylims
     meshx = xmin + (xmax - xmin) * 1. * np.array(range(1, xbins + 1)) / xbins
     meshy = ymin + (ymax - ymin) * 1. * np.array(range(1, ybins + 1)) / ybins
 
-    Cnts = np.zeros((ybins, xbins))
-    if M.shape[0] <= 1:
-        return Cnts
-
-    bin_idx = meshx.searchsorted(M[1, :], side='right')
-    bin_idy = meshy.searchsorted(M[2, :], side='right')
-    for k in range(M.shape[1] - 1):
-        if bin_idx[k] == xbins:
-            bin_idx[k] -= 1
-        if bin_idy[k] == ybins:
-            bin_idy[k] -= 1
-        Cnts[ybins - bin_idy[k] - 1, bin_idx[k]] += M[0, k + 1] - M[0, k]
+    bin_idx = np.minimum(meshx.searchsorted(x, side='right'), xbins - 1)
+    bin_idy = np.minimum(meshy.searchsorted(y, side='right'), ybins - 1)
+    return (ybins - bin_idy - 1) * xbins + bin_idx
+
+
+def total_time_rectangle_bins(
+        M, xlims=(0, 1), ylims=(0, 1), xbins=5, ybins=10):
+    """
+    given an (3 x n) numpy array M where the 0th row is array of times
+    [ASSUMED SORTED]
+
+    returns a new (ybins x xbins) array (copy) that contains the total
+    time spent in each rectangle: each position is held until the next
+    time, so the last one is not counted
+    """
+    return total_time_rectangle_bins_mousedays(
+        [M], xlims=xlims, ylims=ylims, xbins=xbins, ybins=ybins)[0]
+
+
+def total_time_rectangle_bins_mousedays(
+        Ms, xlims=(0, 1), ylims=(0, 1), xbins=5, ybins=10):
+    """
+    given a sequence of n (3 x n_i) numpy arrays Ms as in
+    total_time_rectangle_bins, e.g. one per mouse day
+
+    returns a new (n x ybins x xbins) array whose i-th slice is
+    total_time_rectangle_bins(Ms[i]); the times of all the arrays are
+    accumulated at once
+    """
+    Ms = [np.asarray(M) for M in Ms]
+    Cnts = np.zeros((len(Ms), ybins, xbins))
+
+    bins, weights = [], []
+    for i, M in enumerate(Ms):
+        if M.shape[0] <= 1 or M.shape[1] <= 1:
+            continue
+        bins.append(i * ybins * xbins + _rectangle_bins(
+            M[1, :-1], M[2, :-1], xlims, ylims, xbins, ybins))
+        weights.append(np.diff(M[0]))
+    if bins:
+        Cnts += np.bincount(np.concatenate(bins),
+                            weights=np.concatenate(weights),
+                            minlength=Cnts.size).reshape(Cnts.shape)
     return Cnts
 
 
 def idx_restrict_to_rectangles(TXY, rects=[(0, 0)], xlims=(
-        0, 1), ylims=(0, 1), xbins=2, ybins=4, eps=.01):
+        0, 1), ylims=(0, 1), xbins=2, ybins=4, eps=.01, return_ids=False,
+        chunksize=2**16):
     """
     given (3 x T) TXY with 0th row array of times [ASSUMED SORTED] and rows
     1,2 are x,y coords
 
-    returns new interval array which is E minus those things occuring
-    outside of given rectangle
+    returns a boolean array of the movements occuring strictly inside one
+    of the given rectangles (see map_xbins_ybins_to_cage), and also, if
+    return_ids, an int array of the position in rects of the rectangle of
+    each movement (the first one if they overlap), or -1
+
+    the movements are tested against all rectangles at once, chunksize
+    movements at a time
     """
-    num_movements = TXY.shape[1]
-    idx_F_bout = np.zeros(num_movements, dtype=bool)  # when at rectangles
-    tmp_sum = 0
-
-    for rect in rects:
-        tl, tr, bl, br = map_xbins_ybins_to_cage(
-            rectangle=rect, xbins=xbins, ybins=ybins)
-
-        for t in range(num_movements):
-            if ((TXY[1, t] > tl[0]) and (TXY[1, t] < tr[0]) and (
-                    TXY[2, t] < tl[1]) and (TXY[2, t] > bl[1])):
-                idx_F_bout[t] = True
-            # print ("indexed %d move events " % (sum(idx_F_bout) - tmp_sum))
-        tmp_sum += sum(idx_F_bout)
-
-    # print ("Total move events: %d" % num_movements)
-    # print ("indexing %d/%d (%1.1f percent) movements at rectangles" %
-    # (sum(idx_F_bout), num_movements, 100. * sum(idx_F_bout) / num_movements))
-
-    return idx_F_bout
+    # left, right, top and bottom edges of each rectangle
+    corners = np.array([map_xbins_ybins_to_cage(
+        rectangle=rect, xbins=xbins, ybins=ybins)
+        for rect in rects], dtype=float).reshape((-1, 4, 2))
+    left, top = corners[:, 0, 0], corners[:, 0, 1]
+    right, bottom = corners[:, 1, 0], corners[:, 2, 1]
+
+    num_movements = TXY.shape[1] if len(rects) else 0
+    ids = np.full(TXY.shape[1], -1, dtype=np.intp)
+    for start in range(0, num_movements, chunksize):
+        x = np.asarray(TXY[1, start:start + chunksize])[:, None]
+        y = np.asarray(TXY[2, start:start + chunksize])[:, None]
+        inside = (x > left) & (x < right) & (y < top) & (y > bottom)
+        found = inside.any(axis=1)
+        ids[start:start + chunksize][found] = inside[found].argmax(axis=1)
+
+    if return_ids:
+        return ids >= 0, ids
+    return ids >= 0
 
 
 def map_xbins_ybins_to_cage(rectangle=(0, 0), xbins=2, ybins=4,
@@ -2,7 +2,7 @@ from __future__ import print_function, absolute_import, division
 
 import numpy as np
 from scipy import stats, optimize
-from mousestyles.data import load_movement
+from mousestyles.data import MouseDay
 
 
 def get_travel_distances(strain=0, mouse=0, day=0):
@@ -28,8 +28,7 @@ def get_travel_distances(strain=0, mouse=0, day=0):
     >>> get_travel_distances(0, 0, 0)[:3]
     array([ 1.00648944,  1.02094319,  1.0178885 ])
     """
-    df = load_movement(strain=strain, mouse=mouse, day=day)
-    x = np.array(np.sqrt(df.x.diff()**2 + df.y.diff()**2))[1:]
+    x = MouseDay(strain, mouse, day)["dist"]
     x = x[x >= 1]
     return x
 
@@ -1,12 +1,199 @@
 from __future__ import print_function, absolute_import, division
 
+import hashlib
+import multiprocessing
+import os
+
 import pandas as pd
 import numpy as np
 from math import ceil
-from mousestyles import data
+from matplotlib.externals import six
+from mousestyles import data, data_dir
+from mousestyles.data.derived import DerivedStore, open_derived, save_npy
+
+# on-disk cache of the rows of the time matrix, see create_time_matrix;
+# the version must be increased whenever the computation of the rows
+# changes
+TIME_MATRIX_DIR = os.path.join(data_dir, "time_matrix")
+TIME_MATRIX_VERSION = 1
+
+
+def _combine_bouts(intervals, combined_gap):
+    r"""
+    Return the start and stop times of the bouts of the sorted (n x 2)
+    intervals, combining the intervals separated by at most combined_gap.
+    """
+    n = intervals.shape[0]
+    index = np.flatnonzero(intervals[1:, 0] - intervals[:n - 1, 1] >
+                           combined_gap)
+    if n == 0:
+        return intervals[:, 0], intervals[:, 1]
+    return (intervals[np.append(0, index + 1), 0],
+            intervals[np.append(index, n - 1), 1])
+
+
+def _paint_bouts(starts, stops, columns):
+    r"""
+    Return the boolean array of the times in the sorted array columns
+    which are strictly inside one of the bouts (starts, stops).
+    """
+    # bout k covers the columns first[k]:last[k]
+    first = columns.searchsorted(starts, side='right')
+    last = columns.searchsorted(stops, side='left')
+    keep = first < last
+    cover = np.bincount(first[keep], minlength=len(columns) + 1) - \
+        np.bincount(last[keep], minlength=len(columns) + 1)
+    return np.cumsum(cover[:-1]) > 0
+
+
+def _time_matrix_row(AS, F, W, columns, combined_gap):
+    r"""
+    Return the uint8 states at the times columns of a mouse day with the
+    given (n x 2) AS, F and W intervals: 0 outside of the AS bouts, and
+    within them 1 during F bouts, else 2 during W bouts, else 3.
+    """
+    active = _paint_bouts(*_combine_bouts(AS, combined_gap),
+                          columns=columns)
+    row = np.where(active, 3, 0).astype(np.uint8)
+    row[active & _paint_bouts(*_combine_bouts(W, combined_gap),
+                              columns=columns)] = 2
+    row[active & _paint_bouts(*_combine_bouts(F, combined_gap),
+                              columns=columns)] = 1
+    return row
+
+
+def _run_lengths(matrix):
+    r"""
+    Return the row, first column, length and state of the runs of equal
+    states of each row of the (n x m) matrix, in row-major order.
+    """
+    flat = matrix.ravel()
+    new = np.ones(flat.shape[0], dtype=bool)
+    new[1:] = flat[1:] != flat[:-1]
+    new[::matrix.shape[1]] = True
+    first = np.flatnonzero(new)
+    lengths = np.diff(np.append(first, flat.shape[0]))
+    return (first // matrix.shape[1], first % matrix.shape[1], lengths,
+            flat[first])
+
+
+def _time_matrix_store(cache):
+    r"""
+    Return the DerivedStore of the rows of the time matrix given by the
+    cache argument of create_time_matrix, or None.
+    """
+    if cache is True:
+        return open_derived(TIME_MATRIX_DIR, TIME_MATRIX_VERSION)
+    if isinstance(cache, DerivedStore):
+        return cache
+    if cache is False or cache is None:
+        return None
+    raise ValueError("cache should be True, False or a DerivedStore")
+
+
+def _time_matrix_grid(combined_gap, time_gap):
+    r"""
+    Return the days, the arguments of np.arange giving the times of the
+    columns and the name of the rows in the cache of the time matrix of
+    the given parameters.
+    """
+    intervals_AS = data.load_intervals_index('AS')
+    intervals_IS = data.load_intervals_index('IS')
+    # 137 days totally
+    days = intervals_AS.keys
+    # set time range for columns
+    initial = int(intervals_IS.values[:, 1].min())
+    end = int(intervals_IS.values[:, 1].max()) + 1
+    grid = (initial, end + 1, time_gap)
+    # the rows depend on the parameters and on the columns
+    name = "gap{!r}_step{!r}_{}_{}".format(float(combined_gap),
+                                           float(time_gap), initial, end)
+    return days, grid, name
+
+
+def _interval_files(key):
+    r"""
+    Return the paths of the AS, F and W interval files of a mouse day.
+    """
+    catalog = data.get_catalog()
+    return [catalog.interval_path(feature, *key)
+            for feature in ('AS', 'F', 'W')]
 
 
-def create_time_matrix(combined_gap=4, time_gap=1, days_index=137):
+def _interval_tags(days):
+    r"""
+    Return, for each mouse day, a digest of the size and modification
+    time of its AS, F and W interval files, which tags its row in the
+    cache so that the row is computed again when one of them changes.
+    """
+    tags = []
+    for key in days:
+        stats = []
+        for file_name in _interval_files(key):
+            try:
+                stat = os.stat(file_name)
+                stats.append((stat.st_size, stat.st_mtime))
+            except OSError:
+                stats.append(None)
+        tags.append(hashlib.md5(repr(stats).encode()).hexdigest()[:12])
+    return tags
+
+
+def _time_matrix_task(args):
+    key, grid, combined_gap, store, name, tag = args
+    columns = np.arange(*grid)
+
+    def compute():
+        # the files themselves, which the tag describes
+        intervals = [np.load(file_name).reshape(-1, 2)
+                     if os.path.exists(file_name) else np.zeros((0, 2))
+                     for file_name in _interval_files(key)]
+        return _time_matrix_row(*intervals, columns=columns,
+                                combined_gap=combined_gap)
+    if store is None:
+        return compute()
+    return store.get(name, key[0], key[1], key[2], compute, tag)[0]
+
+
+def _time_matrix_rows(matrix, days, grid, combined_gap, name,
+                      store=None, workers=1, tags=None):
+    r"""
+    Fill the rows of matrix with the states of the mouse days in days,
+    reading the rows found in store and computing the others, in this
+    process or in a pool of workers, and saving them to store.  The rows
+    are tagged with tags, by default those of _interval_tags.
+    """
+    if store is not None and tags is None:
+        tags = _interval_tags(days)
+    missing = []
+    for i, key in enumerate(days):
+        row = None
+        if store is not None:
+            row = store.load(name, *key, tag=tags[i])
+        if row is None:
+            missing.append(i)
+        else:
+            matrix[i] = row
+    tasks = [(tuple(int(k) for k in days[i]), grid, combined_gap, store,
+              name, None if store is None else tags[i]) for i in missing]
+    pool = None
+    if workers == 1 or len(tasks) < 2:
+        results = six.moves.map(_time_matrix_task, tasks)
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap(_time_matrix_task, tasks)
+    try:
+        for i, row in zip(missing, results):
+            matrix[i] = row
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return matrix
+
+
+def create_time_matrix(combined_gap=4, time_gap=1, days_index=137,
+                       rle=False, workers=1, cache=False):
     r"""
     Return a time matrix for estimate the MLE parobability.
     The rows are 137 mousedays. The columns are time series
@@ -14,6 +201,9 @@ def create_time_matrix(combined_gap=4, time_gap=1, days_index=137):
     0 represents IS, 1 represents eating, 2 represents
     drinking, 3 represents others activity in AS.
 
+    Each row is painted bout by bout onto a uint8 array, so the
+    matrix takes one byte per mouse day and time.
+
     Parameters
     ----------
     combined_gap: nonnegative float or int
@@ -24,12 +214,26 @@ def create_time_matrix(combined_gap=4, time_gap=1, days_index=137):
         The time gap for create the columns time series
     days_index: nonnegative int
         The number of days to process, from day 0 to day days_index.
+    rle: bool
+        Return the run-length encoding of the matrix instead of the
+        matrix itself.
+    workers: int, optional
+        number of processes computing the rows in parallel; None uses
+        every core.  The output does not depend on it.
+    cache: bool or DerivedStore, optional
+        Where the row of each mouse day is saved once computed, and read
+        from by later calls with the same combined_gap and time_gap: True
+        for the shared store of ``data/time_matrix``; by default every
+        row is computed and nothing is saved.
 
     Returns
     -------
     time: Pandas.DataFrame
         a matrix represents the activity for a certain
-        mouse day and a certain time.
+        mouse day and a certain time. If rle, the runs of a same
+        activity instead, one per row, with columns strain, mouse,
+        day, time (the first time of the run), length (its number of
+        time points) and state.
 
     Examples
     --------
@@ -44,7 +248,7 @@ def create_time_matrix(combined_gap=4, time_gap=1, days_index=137):
         48011     0
         48012     0
         48013     0
-        Name: 0, dtype: float64
+        Name: 0, dtype: int64
     """
     # check all the inputs
     condition_combined_gap = ((type(combined_gap) == int or
@@ -59,71 +263,101 @@ def create_time_matrix(combined_gap=4, time_gap=1, days_index=137):
         raise ValueError("combined_gap should be nonnegative int or float")
     if not condition_days_index:
         raise ValueError("days_index should be nonnegative int")
+    store = _time_matrix_store(cache)
 
-    intervals_AS = data.load_intervals('AS')
-    intervals_F = data.load_intervals('F')
-    intervals_W = data.load_intervals('W')
-    intervals_IS = data.load_intervals('IS')
-    # 137 days totally
-    days = np.array(intervals_AS.iloc[:, 0:3].drop_duplicates().
-                    reset_index(drop=True))
-    # set time range for columns
-    initial = int(min(intervals_IS['stop']))
-    end = int(max(intervals_IS['stop'])) + 1
-    columns = np.arange(initial, end + 1, time_gap)
-    # result matrix
-    matrix = np.zeros((days.shape[0], len(columns)))
+    days, grid, name = _time_matrix_grid(combined_gap, time_gap)
+    columns = np.arange(*grid)
+    # result matrix; the rows after days_index + 1 are left as IS
+    matrix = np.zeros((days.shape[0], len(columns)), dtype=np.uint8)
     # we set 0 as IS, 1 as F, 2 as W, 3 as Others
-    for i in range(days.shape[0]):
-        W = np.array(intervals_W[(intervals_W['strain'] == days[i, 0]) &
-                                 (intervals_W['mouse'] == days[i, 1]) &
-                                 (intervals_W['day'] == days[i, 2])].
-                     iloc[:, 3:5])
-        F = np.array(intervals_F[(intervals_F['strain'] == days[i, 0]) &
-                                 (intervals_F['mouse'] == days[i, 1]) &
-                                 (intervals_F['day'] == days[i, 2])].
-                     iloc[:, 3:5])
-        AS = np.array(intervals_AS[(intervals_AS['strain'] == days[i, 0]) &
-                                   (intervals_AS['mouse'] == days[i, 1]) &
-                                   (intervals_AS['day'] == days[i, 2])].
-                      iloc[:, 3:5])
-        n = W.shape[0]
-        index = (np.array(np.where(W[1:, 0]-W[0:n - 1, 1] >
-                                   combined_gap))).ravel()
-        stop_W = W[np.append(index, n - 1), 1]
-        start_W = W[np.append(0, index + 1), 0]
-        n = F.shape[0]
-        index = (np.array(np.where(F[1:, 0]-F[0:n-1, 1] >
-                                   combined_gap))).ravel()
-        stop_F = F[np.append(index, n - 1), 1]
-        start_F = F[np.append(0, index + 1), 0]
-        n = AS.shape[0]
-        index = (np.array(np.where(AS[1:, 0]-AS[0:n - 1, 1] >
-                                   combined_gap))).ravel()
-        stop_AS = AS[np.append(index, n - 1), 1]
-        start_AS = AS[np.append(0, index + 1), 0]
-        for j in range(len(columns)):
-            if sum(np.logical_and(columns[j] > start_AS, columns[j] <
-                                  stop_AS)) != 0:
-                if sum(np.logical_and(columns[j] > start_F, columns[j] <
-                                      stop_F)) != 0:
-                    matrix[i, j] = 1  # food
-                elif sum(np.logical_and(columns[j] > start_W, columns[j] <
-                                        stop_W)) != 0:
-                    matrix[i, j] = 2  # water
-                else:
-                    matrix[i, j] = 3  # others
-        # give you the precent of matrix has been processed
-        print(i / days.shape[0], 'has been processed')
-        if i > days_index:
-            break
+    processed = min(days_index + 2, days.shape[0])
+    _time_matrix_rows(matrix[:processed], days[:processed], grid,
+                      combined_gap, name, store, workers)
+    title = pd.DataFrame(days, columns=['strain', 'mouse', 'day'])
+    if rle:
+        rows, first, lengths, states = _run_lengths(matrix)
+        runs = pd.DataFrame({'time': columns[first], 'length': lengths,
+                             'state': states},
+                            columns=['time', 'length', 'state'])
+        return pd.concat([title.iloc[rows].reset_index(drop=True), runs],
+                         axis=1)
     # format data frame
     matrix = pd.DataFrame(matrix, columns=columns)
-    title = pd.DataFrame(days, columns=['strain', 'mouse', 'day'])
     time_matrix = pd.concat([title, matrix], axis=1)
     return(time_matrix)
 
 
+def load_time_matrix(combined_gap=4, time_gap=1, workers=1, cache=True):
+    r"""
+    Return the time matrix of create_time_matrix for all the mouse days,
+    as a read-only memory map of a file of the cache.
+
+    The rows missing from the cache are computed and saved first, so
+    that a sweep over combined_gap or time_gap only computes each row
+    once, and new mouse days only their own rows.  A row is also
+    computed again when the size or modification time of one of the
+    interval files of its mouse day changes.  IOError is raised if the
+    matrix cannot be written to the cache.
+
+    Parameters
+    ----------
+    combined_gap: nonnegative float or int
+        see create_time_matrix
+    time_gap: positive float or int
+        see create_time_matrix
+    workers: int, optional
+        number of processes computing the missing rows in parallel
+    cache: True or DerivedStore, optional
+        the cache of the rows, by default ``data/time_matrix``
+
+    Returns
+    -------
+    matrix: numpy.memmap
+        (mouse days x times) uint8 states, as in create_time_matrix
+    days: numpy.ndarray
+        strain, mouse and day of each row
+    columns: numpy.ndarray
+        time of each column
+
+    Examples
+    --------
+    >>> matrix, days, columns = load_time_matrix(combined_gap=4,
+                                                 time_gap=1, workers=4)
+    """
+    store = _time_matrix_store(cache)
+    if store is None:
+        raise ValueError("cache should be True or a DerivedStore")
+    days, grid, name = _time_matrix_grid(combined_gap, time_gap)
+    columns = np.arange(*grid)
+    directory = os.path.join(store.path, name)
+    matrix_file = os.path.join(directory, "matrix.npy")
+    days_file = os.path.join(directory, "days.npy")
+    tags_file = os.path.join(directory, "tags.npy")
+    tags = np.array(_interval_tags(days))
+    # the assembled matrix is kept until the mouse days or their interval
+    # files change
+    if not all(os.path.exists(file_name) and
+               np.array_equal(np.load(file_name), value)
+               for file_name, value in [(days_file, days),
+                                        (tags_file, tags)]) or \
+            not os.path.exists(matrix_file):
+        matrix = np.zeros((days.shape[0], len(columns)), dtype=np.uint8)
+        _time_matrix_rows(matrix, days, grid, combined_gap, name, store,
+                          workers, tags)
+        # the tags are written last, so that the matrix is only used once
+        # complete
+        try:
+            os.remove(tags_file)
+        except OSError:
+            pass
+        for file_name, value in [(matrix_file, matrix), (days_file, days),
+                                 (tags_file, tags)]:
+            if not save_npy(file_name, value):
+                raise IOError("Cannot write the time matrix to {}".format(
+                    directory))
+    return np.load(matrix_file, mmap_mode="r"), days, columns
+
+
 def get_prob_matrix_list(time_df, interval_length=1000):
     r"""
     returns a list of probability transition matrices
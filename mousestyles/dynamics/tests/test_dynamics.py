@@ -1,11 +1,15 @@
 from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
+import os
+
 import pytest
 import numpy as np
 import pandas as pd
 
-from mousestyles.dynamics import create_time_matrix
+from mousestyles import data
+from mousestyles.data.derived import DerivedStore
+from mousestyles.dynamics import create_time_matrix, load_time_matrix
 from mousestyles.dynamics import get_prob_matrix_list
 from mousestyles.dynamics import get_prob_matrix_small_interval
 from mousestyles.dynamics import mcmc_simulation
@@ -36,6 +40,11 @@ def test_creat_time_matrix_input():
     with pytest.raises(ValueError) as excinfo:
         create_time_matrix(combined_gap=4, time_gap=1, days_index=0.1)
     assert excinfo.value.args[0] == "days_index should be nonnegative int"
+    # cache is not a store
+    with pytest.raises(ValueError) as excinfo:
+        create_time_matrix(days_index=0, cache="data/time_matrix")
+    err_string = "cache should be True, False or a DerivedStore"
+    assert excinfo.value.args[0] == err_string
 
 
 def test_creat_time_matrix():
@@ -44,6 +53,77 @@ def test_creat_time_matrix():
     assert matrix.iloc[0, 2181] == 1.0
 
 
+def test_creat_time_matrix_rle():
+    # states are uint8, and the rows after days_index + 1 are left as IS
+    matrix = create_time_matrix(combined_gap=4, time_gap=60, days_index=1)
+    states = matrix.values[:, 3:]
+    assert (matrix.dtypes[3:] == np.uint8).all()
+    assert states[:3].any(axis=1).all()
+    assert not states[3:].any()
+    # the runs decode to the same matrix
+    runs = create_time_matrix(combined_gap=4, time_gap=60, days_index=1,
+                              rle=True)
+    assert list(runs.columns) == ['strain', 'mouse', 'day', 'time',
+                                  'length', 'state']
+    assert (runs['state'].values[1:] != runs['state'].values[:-1]).any()
+    decoded = np.repeat(runs['state'].values, runs['length'].values)
+    np.testing.assert_array_equal(decoded, states.ravel())
+    start = matrix.columns[3]
+    assert runs['time'][0] == start
+    assert runs['time'][1] == start + 60 * runs['length'][0]
+
+
+def test_creat_time_matrix_cache(tmpdir):
+    # rows are saved once per mouse day and parameters
+    store = DerivedStore(str(tmpdir))
+    matrix = create_time_matrix(combined_gap=4, time_gap=60, days_index=0,
+                                cache=store)
+    rows = tmpdir.join("v1", "gap4.0_step60.0_48007_136290")
+    assert len(rows.listdir()) == 2
+    cached = create_time_matrix(combined_gap=4, time_gap=60, days_index=2,
+                                cache=store, workers=2)
+    assert len(rows.listdir()) == 4
+    assert cached.iloc[:2].equals(matrix.iloc[:2])
+    assert cached.equals(create_time_matrix(
+        combined_gap=4, time_gap=60, days_index=2, cache=False))
+    # the full matrix is memory-mapped from the cache
+    states, days, columns = load_time_matrix(combined_gap=4, time_gap=60,
+                                             cache=store)
+    assert isinstance(states, np.memmap)
+    assert states.shape == (137, len(columns))
+    np.testing.assert_array_equal(states[:4], cached.values[:4, 3:])
+    np.testing.assert_array_equal(days, cached.values[:, :3])
+    with pytest.raises(ValueError):
+        load_time_matrix(cache=False)
+    # rows are computed again when an interval file changes
+    states = np.array(states)
+    tags = np.load(str(rows.join("tags.npy")))
+    AS = data.get_catalog().interval_path('AS', *days[0])
+    stat = os.stat(AS)
+    try:
+        os.utime(AS, (stat.st_atime, stat.st_mtime + 10))
+        create_time_matrix(combined_gap=4, time_gap=60, days_index=0,
+                           cache=store)
+        assert len(rows.listdir(
+            fil="*_strain{}_mouse{}_day{}_*".format(*days[0]))) == 2
+        again, _, _ = load_time_matrix(combined_gap=4, time_gap=60,
+                                       cache=store)
+        new_tags = np.load(str(rows.join("tags.npy")))
+        assert new_tags[0] != tags[0]
+        np.testing.assert_array_equal(new_tags[1:], tags[1:])
+        np.testing.assert_array_equal(again, states)
+    finally:
+        os.utime(AS, (stat.st_atime, stat.st_mtime))
+    # a matrix which cannot be written leaves no partial file
+    store = DerivedStore(str(tmpdir.join("other")))
+    rows = tmpdir.join("other", "v1", "gap4.0_step60.0_48007_136290")
+    rows.join("matrix.npy").ensure(dir=True)
+    with pytest.raises(IOError):
+        load_time_matrix(combined_gap=4, time_gap=60, cache=store)
+    assert not [name for name in rows.listdir()
+                if name.basename.endswith(".tmp")]
+
+
 def test_get_prob_matrix_list_input():
     # checking functions raise the correct errors for wrong input
     # time_df is not DataFrame
@@ -30,10 +30,7 @@ def getdistance(strain, mouse, day):
     array([ 1.00648944,  1.02094319,  1.0178885 , ...,  1.00099351,
     1.01191156,  1.00423354])
     """
-    df = data.load_movement(strain, mouse, day)
-    xcood = df["x"]
-    ycood = df["y"]
-    distance_vector = np.sqrt(np.diff(xcood)**2 + np.diff(ycood)**2)
+    distance_vector = data.MouseDay(strain, mouse, day)["dist"]
     msk = distance_vector > 1
     cut_dist = distance_vector[msk]
     return(cut_dist)
@@ -115,19 +112,18 @@ def fit_dist_all():
     7.385844980814098
     """
     esti_df = {"strain": [], "mouse": [], "day": [], "power": [], "exp": []}
-    for i in range(3):
-        for j in range(4):
-            for k in range(12):
-                try:
-                    temp1 = fit_powerlaw(i, j, k)
-                    temp2 = fit_exponential(i, j, k)
-                    esti_df["strain"].append(i)
-                    esti_df["mouse"].append(j)
-                    esti_df["day"] .append(k)
-                    esti_df["power"] .append(temp1)
-                    esti_df["exp"] .append(temp2)
-                except:
-                    next
+    for i, j, k in data.list_mousedays():
+        try:
+            temp1 = fit_powerlaw(i, j, k)
+            temp2 = fit_exponential(i, j, k)
+        except ValueError:
+            # no distance above the truncation for this mouse day
+            continue
+        esti_df["strain"].append(i)
+        esti_df["mouse"].append(j)
+        esti_df["day"] .append(k)
+        esti_df["power"] .append(temp1)
+        esti_df["exp"] .append(temp2)
     estimation = pd.DataFrame(
         esti_df, columns=["strain", "mouse", "day", "power", "exp"])
     return estimation
@@ -15,6 +15,7 @@ from data_utils import (day_to_mouse_average,
                         pull_locom_tseries_subset,
                         split_data_in_half_randomly)
 from intervals import Intervals, binary_from_intervals
+from mousestyles.data import get_catalog
 
 
 # Data set consists of 1921 Mouse days (22 hours each) from 170 Mice and
@@ -140,25 +141,13 @@ for AS_i, AS in enumerate(feat_arr):
 # (2) Raw Event Arrays Eexample: AS Numbers
 ##################################
 event = events[0]
+catalog = get_catalog()  # mice and days available in the data directory
 strain_intervals = [[] for i in range(len(strains))]
-for i in range(len(strains)):
-    strain_labels = labels[labels[:, 0] == i]
-    mice = {}   # determine mice in strain
-    for c in range(strain_labels.shape[0]):
-        if not mice.get(strain_labels[c, 1]):
-            mice[strain_labels[c, 1]] = 1
-        else:
-            mice[strain_labels[c, 1]] += 1
-
-    mices = [[[] for c2 in range(mice[c1])] for c1 in range(len(mice))]
-
-    for mouse in range(len(mice)):
-        for day in range(mice[mouse]):
-            arr = np.load('data/intervals/%s/%s_strain%d_mouse%d_day%d.npy' %
-                          (event, event, i, mouse, day))
-            mices[mouse][day] = arr
-
-    strain_intervals[i] = mices
+for i in catalog.strains():
+    strain_intervals[i] = [[np.load(catalog.interval_path(event, i, mouse,
+                                                          day))
+                            for day in catalog.days(i, mouse)]
+                           for mouse in catalog.mice(i)]
 
 fmfs = first_mouse_first_strain = strain_intervals[0][0]
 nd = nday_this_mouse = len(fmfs)
@@ -67,28 +67,32 @@ class Intervals(object):
                 (self.intervals[:, 1] >= self.intervals[:, 0]).all())
 
     def _make_disjoint(self):
-        """ Remove intervals [a, b] with a > b """
+        """ Remove intervals [a, b] with a > b and union together
+            intervals that overlap (intervals are sorted by a) """
         good_intervals_idx = self.intervals[:, 1] >= self.intervals[:, 0]
-        self.intervals = self.intervals[good_intervals_idx, :]
-        # union together intervals that overlap
-        tot = None
-        curr_idx = 0
-        curr_lhs = self.intervals[curr_idx, 0]
-        curr_rhs = self.intervals[curr_idx, 1]
-        while curr_idx < self.intervals.shape[0]:
-            while curr_rhs >= self.intervals[curr_idx, 0]:
-                curr_rhs = max(curr_rhs, self.intervals[curr_idx, 1])
-                curr_idx += 1
-                if curr_idx >= self.intervals.shape[0]:
-                    break
-            if tot is None:
-                tot = np.array([curr_lhs, curr_rhs])
-            else:
-                tot = np.vstack((tot, np.array([curr_lhs, curr_rhs])))
-            if curr_idx < self.intervals.shape[0]:
-                curr_lhs = self.intervals[curr_idx, 0]
-                curr_rhs = self.intervals[curr_idx, 1]
-        self.intervals = np.atleast_2d(tot)
+        ivt = self.intervals[good_intervals_idx, :]
+        if ivt.shape[0] == 0:
+            self.intervals = np.array([])
+            return
+        # rightmost point reached by the intervals seen so far; a new
+        # merged interval starts wherever a left end is beyond it
+        reach = np.maximum.accumulate(ivt[:, 1])
+        breaks = np.flatnonzero(ivt[1:, 0] > reach[:-1]) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks - 1, [ivt.shape[0] - 1]))
+        self.intervals = np.column_stack((ivt[first, 0], reach[last]))
+
+    @classmethod
+    def _from_sorted(cls, intervals):
+        """ New Intervals object from an (M x 2) array already sorted by
+            left endpoint (skips the sort done in __init__). """
+        F = cls()
+        if len(intervals) == 0:
+            return F
+        F.intervals = np.atleast_2d(intervals)
+        if not F._is_disjoint():
+            F._make_disjoint()
+        return F
 
     def copy(self):
         return Intervals(self.intervals.copy())
@@ -109,6 +113,17 @@ class Intervals(object):
             return True
         return False
 
+    def contains_many(self, x):
+        """ Vectorized contains: boolean array telling for each element
+            of the array x whether it is in the Finite Union of Intervals.
+        """
+        x = np.asarray(x, dtype=np.double)
+        if self.is_empty():
+            return np.zeros(x.shape, dtype=bool)
+        # last interval starting at or before each x
+        idx = self.intervals[:, 0].searchsorted(x, side='right') - 1
+        return (idx >= 0) & (x <= self.intervals[np.maximum(idx, 0), 1])
+
     def index_of_first_intersection(self, x, find_nearest=False):
         """ finds interval nearest to given number x and containing x
             if find_nearest=False: doesn't require x to be in the interval """
@@ -149,16 +164,22 @@ class Intervals(object):
             return self
         if self.is_empty():
             return F
-        return Intervals(np.vstack((self.intervals, F.intervals)))
+        both = np.vstack((self.intervals, F.intervals))
+        # a stable sort merges the two presorted runs in linear time
+        idx = both[:, 0].argsort(kind='mergesort')
+        return Intervals._from_sorted(both[idx, :])
 
     def intersect(self, F):
         """ New Intervals object which is the intersection of self and
-            Intervals F. """
+            Intervals F.
+            (this is the closure of the intersection of the interiors,
+            so intervals that only touch and point intervals drop out) """
         if F.is_empty():
             return F
         if self.is_empty():
             return self
-        return ~(~self + ~F)
+        return Intervals._from_sorted(
+            _intersect_open(self._interior(), F._interior()))
 
     def intersect_with_interval(self, a, b):
         """ returns (not a copy) Intervals object which is the intersection
@@ -166,14 +187,18 @@ class Intervals(object):
             (faster than intersect) """
         if self.is_empty():
             return self
-        if (self.intervals[:, 1] > a).sum() == 0 or \
-           (self.intervals[:, 0] < b).sum() == 0:
+        # first interval ending after a, last one starting before b
+        idx_first_gta = self.intervals[:, 1].searchsorted(a, side='right')
+        idx_last_ltb = self.intervals[:, 0].searchsorted(b, side='left')
+        if idx_first_gta == self.intervals.shape[0] or idx_last_ltb == 0:
             return Intervals()
-        idx_first_gta = (self.intervals[:, 1] > a).nonzero()[0][0]
-        idx_last_ltb = self.intervals.shape[
-            0] - (self.intervals[:, 0] < b)[::-1].nonzero()[0][0]
         return Intervals(self.intervals[idx_first_gta:idx_last_ltb, :])
 
+    def index(self):
+        """ IntervalsIndex answering batched queries on a snapshot of
+            self """
+        return IntervalsIndex(self)
+
     def complement(self):
         """ New Intervals object which is the complement of self. """
         if self.is_empty():
@@ -223,47 +248,69 @@ class Intervals(object):
         self.intervals = A.intervals
         return self
 
-    def connect_gaps_by_rule(self, rule):
+    def connect_gaps_by_rule(self, rule, vectorized=False):
         """ Returns a new object with gaps connected when rule returns True.
         parameters
-            rule: Callable that takes parameters start_time and end_time.
+            rule: Callable that takes parameters start_time and end_time
+                of a gap.
+            vectorized: if True, rule takes the arrays of the start and
+                end times of all the gaps and returns a boolean array;
+                otherwise rule is called once per gap.
         """
         if self.is_empty():
             return self
-        new_intervals = []
-        i = 0
-        dim = self.intervals.shape[0]
-        while i < dim:
-            a = self.intervals[i, 0]
-            while i + 1 < dim and rule(self.intervals[i, 1],
-                                       self.intervals[i + 1, 0]):
-                i += 1
-            b = self.intervals[i, 1]
-            new_intervals.append([a, b])
-            i += 1
-        return Intervals(np.array(new_intervals))
+        ivt = self.intervals
+        connect = _gap_mask(rule, ivt[:-1, 1], ivt[1:, 0], vectorized)
+        # each run of connected gaps merges into one interval
+        breaks = np.flatnonzero(~connect) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks - 1, [ivt.shape[0] - 1]))
+        return Intervals._from_sorted(np.column_stack((ivt[first, 0],
+                                                       ivt[last, 1])))
 
     def remove(self, other):
-        return self.intersect(~other)
+        """ New Intervals object with the points of other removed from
+            self (the closure, as for intersect). """
+        return Intervals._from_sorted(
+            _intersect_open(self._interior(), other._gaps()))
 
     def symmetric_difference(self, other):
+        """ New Intervals object with the points in exactly one of
+            self and other. """
         return (self - other) + (other - self)
 
+    def _interior(self):
+        """ (M x 2) array of the intervals [a, b] with a < b, read as
+            open intervals (a, b) """
+        if self.is_empty():
+            return np.zeros((0, 2))
+        return self.intervals[self.intervals[:, 1] > self.intervals[:, 0]]
+
+    def _gaps(self):
+        """ (M x 2) array of the open intervals between the intervals of
+            positive length, i.e. the interior of the complement """
+        ivt = self._interior()
+        lefts = np.concatenate(([-np.inf], ivt[:, 1]))
+        rights = np.concatenate((ivt[:, 0], [np.inf]))
+        keep = lefts < rights
+        return np.column_stack((lefts[keep], rights[keep]))
+
     def subordinate_to_array(self, arr):
         """ returns a new Intervals object with only intervals containing
             elements of arr
             (NOTE: arr is assumed sorted)
         """
         arr = np.array(arr)
-        F = Intervals()
-        for interval in self.intervals:
-            a, b = interval[0], interval[1]
-            idxa = arr.searchsorted(a)
-            idxb = arr.searchsorted(b)
-            # arr has a point in interval
-            if idxa != idxb or (idxa < len(arr) and a == arr[idxa]):
-                F += Intervals([a, b])
-        return F
+        if self.is_empty():
+            return Intervals()
+        a, b = self.intervals[:, 0], self.intervals[:, 1]
+        idxa = arr.searchsorted(a)
+        idxb = arr.searchsorted(b)
+        # arr has a point in interval
+        keep = idxa != idxb
+        at_a = idxa < len(arr)
+        keep[at_a] |= a[at_a] == arr[idxa[at_a]]
+        return Intervals._from_sorted(self.intervals[keep])
 
     def save(self, filename='Intervals_save'):
         np.savez(filename, intervals=self.intervals)
@@ -285,39 +332,517 @@ class Intervals(object):
         return self.complement().trim(ISDT)
 
 
+class IntervalsIndex(object):
+    """ Immutable index of an Intervals object for batched queries.
+
+    The intervals of an Intervals object are sorted and disjoint, so both
+    their starts and their stops are sorted, and every query below is a
+    binary search over one of them: O(log n) per query point, vectorized
+    over arrays of queries.  Intervals are closed, and are identified by
+    their row in the intervals array (their id).
+
+    parameters
+        F: Intervals object; the index keeps a read-only copy of its
+            intervals, so later changes to F do not affect it
+    """
+
+    def __init__(self, F):
+        if F.is_empty():
+            intervals = np.zeros((0, 2))
+        else:
+            intervals = np.atleast_2d(F.intervals).astype(np.double)
+        self.intervals = intervals
+        self.intervals.setflags(write=False)
+        self.starts = np.ascontiguousarray(intervals[:, 0])
+        self.stops = np.ascontiguousarray(intervals[:, 1])
+        self.starts.setflags(write=False)
+        self.stops.setflags(write=False)
+
+    def __len__(self):
+        return self.intervals.shape[0]
+
+    def stab(self, x):
+        """ id of the interval containing each point of x, -1 if none """
+        x = np.asarray(x, dtype=np.double)
+        if len(self) == 0:
+            return -np.ones(x.shape, dtype=np.intp)
+        # last interval starting at or before x
+        ids = self.starts.searchsorted(x, side='right') - 1
+        inside = (ids >= 0) & (x <= self.stops[np.maximum(ids, 0)])
+        return np.where(inside, ids, -1)
+
+    def overlap_range(self, a, b):
+        """ first and stop ids of the intervals meeting each [a, b]: the
+            ids first[k] to stop[k] - 1 meet [a[k], b[k]] """
+        a = np.asarray(a, dtype=np.double)
+        b = np.asarray(b, dtype=np.double)
+        first = self.stops.searchsorted(a, side='left')
+        stop = self.starts.searchsorted(b, side='right')
+        return first, np.maximum(stop, first)
+
+    def overlap_pairs(self, a, b):
+        """ query numbers k and interval ids of every interval meeting
+            [a[k], b[k]], sorted by query then id """
+        first, stop = self.overlap_range(np.ravel(a), np.ravel(b))
+        counts = stop - first
+        queries = np.repeat(np.arange(counts.shape[0]), counts)
+        offsets = np.cumsum(counts) - counts
+        ids = np.arange(counts.sum()) - np.repeat(offsets - first, counts)
+        return queries, ids
+
+    def nearest(self, x):
+        """ id of the interval nearest to each point of x, and the
+            distance to it (0 inside an interval); ties go to the earlier
+            interval, and the id is -1 if the index is empty """
+        x = np.asarray(x, dtype=np.double)
+        if len(self) == 0:
+            return -np.ones(x.shape, dtype=np.intp), \
+                np.full(x.shape, np.inf)
+        n = len(self)
+        before = self.starts.searchsorted(x, side='right') - 1
+        after = np.minimum(before + 1, n - 1)
+        before = np.maximum(before, 0)
+        # distance to the interval starting at or before x (if any) and
+        # to the next one
+        d_before = np.maximum(np.maximum(self.starts[before] - x,
+                                         x - self.stops[before]), 0)
+        d_after = np.maximum(np.maximum(self.starts[after] - x,
+                                        x - self.stops[after]), 0)
+        use_after = d_after < d_before
+        return (np.where(use_after, after, before),
+                np.where(use_after, d_after, d_before))
+
+
+class IntervalsArray(object):
+    """ Ragged array of Finite Unions of Intervals, e.g. one per mouse-day.
+
+    All the groups share one flat (N x 2) array of endpoints; the
+    intervals of group i are intervals[offsets[i]:offsets[i + 1]].  Each
+    group is kept sorted and disjoint as in Intervals, and the methods
+    below work on every group at once, without a loop over the groups.
+
+    parameters
+        intervals: (N x 2) numpy np.double array
+        offsets: (M + 1) array of the first row of each group, followed
+            by N; defaults to a single group
+        keys: optional (M x K) array labelling the groups, e.g. the
+            strain, mouse and day of each group
+    """
+
+    def __init__(self, intervals=None, offsets=None, keys=None):
+        if intervals is None or len(intervals) == 0:
+            intervals = np.zeros((0, 2))
+        intervals = np.asarray(intervals, dtype=np.double).reshape(-1, 2)
+        if offsets is None:
+            offsets = [0, intervals.shape[0]]
+        offsets = np.asarray(offsets, dtype=np.intp)
+        num_groups = offsets.shape[0] - 1
+        groups = np.repeat(np.arange(num_groups), np.diff(offsets))
+        self.keys = keys
+        self._set(*_normalize_groups(groups, intervals), num_groups=num_groups)
+
+    @classmethod
+    def _from_groups(cls, groups, intervals, num_groups, keys=None,
+                     normalize=True):
+        """ New IntervalsArray from the group number of each interval """
+        F = cls.__new__(cls)
+        F.keys = keys
+        if normalize:
+            groups, intervals = _normalize_groups(groups, intervals)
+        F._set(groups, intervals, num_groups)
+        return F
+
+    @classmethod
+    def from_frame(cls, frame, labels=("strain", "mouse", "day")):
+        """ New IntervalsArray with one group per distinct value of the
+            labels columns of frame, e.g. the output of load_intervals;
+            keys holds the labels of each group. """
+        labels = list(labels)
+        values = np.asarray(frame[labels].values)
+        intervals = np.asarray(frame[["start", "stop"]].values,
+                               dtype=np.double)
+        order = np.lexsort(values.T[::-1])
+        values = values[order]
+        new = np.concatenate(([True], (values[1:] != values[:-1]).any(axis=1)))
+        groups = np.cumsum(new) - 1
+        return cls._from_groups(groups, intervals[order], int(new.sum()),
+                                keys=values[new])
+
+    @classmethod
+    def from_list(cls, items, keys=None):
+        """ New IntervalsArray from a list of Intervals objects (or of
+            (n x 2) arrays) """
+        items = [F.intervals if isinstance(F, Intervals) else F
+                 for F in items]
+        items = [np.asarray(F, dtype=np.double).reshape(-1, 2)
+                 for F in items]
+        lengths = [F.shape[0] for F in items]
+        intervals = np.vstack(items) if items else np.zeros((0, 2))
+        groups = np.repeat(np.arange(len(items)), lengths)
+        return cls._from_groups(groups, intervals, len(items), keys=keys)
+
+    def _set(self, groups, intervals, num_groups):
+        counts = np.bincount(groups, minlength=num_groups)
+        self.intervals = intervals
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+        self.offsets = self.offsets.astype(np.intp)
+
+    def _groups(self):
+        """ group number of each interval """
+        return np.repeat(np.arange(len(self)), self.num())
+
+    def __len__(self):
+        return self.offsets.shape[0] - 1
+
+    def __getitem__(self, i):
+        """ Intervals object of group i (a copy) """
+        ivt = self.intervals[self.offsets[i]:self.offsets[i + 1]]
+        return Intervals._from_sorted(ivt.copy())
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __add__(self, F):
+        return self.union(F)
+
+    def __mul__(self, F):
+        return self.intersect(F)
+
+    def __invert__(self):
+        return self.complement()
+
+    def to_list(self):
+        return list(self)
+
+    def num(self):
+        """ number of intervals of each group """
+        return np.diff(self.offsets)
+
+    def measure(self):
+        """ total length of each group """
+        lengths = self.intervals[:, 1] - self.intervals[:, 0]
+        return np.bincount(self._groups(), weights=lengths,
+                           minlength=len(self))
+
+    def trim(self, eps=0.001):
+        """ Removes intervals with lengths <= eps. """
+        idx = self.intervals[:, 1] - self.intervals[:, 0] > eps
+        self._set(self._groups()[idx], self.intervals[idx], len(self))
+        return self
+
+    def complement(self):
+        """ New IntervalsArray of the complement of each group. """
+        num_groups, size = len(self), self.intervals.shape[0]
+        # group i has num[i] + 1 pieces, in rows offsets[i] + i to
+        # offsets[i + 1] + i: [-inf, a_0], [b_0, a_1], ..., [b_k, inf]
+        first = self.offsets[:-1] + np.arange(num_groups)
+        last = self.offsets[1:] + np.arange(num_groups)
+        pieces = np.empty((size + num_groups, 2))
+        is_first = np.zeros(size + num_groups, dtype=bool)
+        is_first[first] = True
+        is_last = np.zeros(size + num_groups, dtype=bool)
+        is_last[last] = True
+        pieces[is_first, 0] = -np.inf
+        pieces[~is_first, 0] = self.intervals[:, 1]
+        pieces[is_last, 1] = np.inf
+        pieces[~is_last, 1] = self.intervals[:, 0]
+        groups = np.repeat(np.arange(num_groups), self.num() + 1)
+        # drop the end pieces of groups unbounded on that side
+        keep = (pieces[:, 1] > -np.inf) & (pieces[:, 0] < np.inf)
+        return IntervalsArray._from_groups(groups[keep], pieces[keep],
+                                           num_groups, keys=self.keys)
+
+    def union(self, F):
+        """ New IntervalsArray which is the union of each group of self
+            with the same group of F. """
+        self._check_aligned(F)
+        groups = np.concatenate((self._groups(), F._groups()))
+        intervals = np.vstack((self.intervals, F.intervals))
+        return IntervalsArray._from_groups(groups, intervals, len(self),
+                                           keys=self.keys)
+
+    def intersect(self, F):
+        """ New IntervalsArray which is the intersection of each group of
+            self with the same group of F (as in Intervals.intersect). """
+        self._check_aligned(F)
+        A_groups, A = self._interior()
+        B_groups, B = F._interior()
+        i, j = _overlapping_pairs(A, B, A_groups, B_groups)
+        pieces = np.column_stack((np.maximum(A[i, 0], B[j, 0]),
+                                  np.minimum(A[i, 1], B[j, 1])))
+        return IntervalsArray._from_groups(A_groups[i], pieces, len(self),
+                                           keys=self.keys, normalize=False)
+
+    def connect_gaps(self, eps=0.001):
+        """ connects consecutive intervals separated by lengths <= eps """
+        H = ~self
+        idx = H.intervals[:, 1] - H.intervals[:, 0] <= eps
+        groups = np.concatenate((self._groups(), H._groups()[idx]))
+        intervals = np.vstack((self.intervals, H.intervals[idx]))
+        self._set(*_normalize_groups(groups, intervals),
+                  num_groups=len(self))
+        return self
+
+    def connect_gaps_by_rule(self, rule, vectorized=False):
+        """ New IntervalsArray with the gaps between consecutive intervals
+            of a group connected when rule returns True (as in
+            Intervals.connect_gaps_by_rule). """
+        groups, ivt = self._groups(), self.intervals
+        inner = np.flatnonzero(groups[1:] == groups[:-1])
+        connect = np.zeros(max(ivt.shape[0] - 1, 0), dtype=bool)
+        connect[inner] = _gap_mask(rule, ivt[inner, 1], ivt[inner + 1, 0],
+                                   vectorized)
+        breaks = np.flatnonzero(~connect) + 1
+        first = np.concatenate(([0], breaks))[:ivt.shape[0]]
+        last = np.concatenate((breaks - 1, [ivt.shape[0] - 1]))
+        last = last[:ivt.shape[0]]
+        return IntervalsArray._from_groups(
+            groups[first], np.column_stack((ivt[first, 0], ivt[last, 1])),
+            len(self), keys=self.keys, normalize=False)
+
+    def ASs(self, ISDT=20):
+        """ returns new object of Active States given self as Events """
+        return self.complement().trim(ISDT).complement()
+
+    def ISs(self, ISDT=20):
+        """ returns new object of Inactive States given self as Events """
+        return self.complement().trim(ISDT)
+
+    def _interior(self):
+        """ group numbers and (N x 2) array of the intervals [a, b] with
+            a < b """
+        idx = self.intervals[:, 1] > self.intervals[:, 0]
+        if idx.all():
+            return self._groups(), self.intervals
+        return self._groups()[idx], self.intervals[idx]
+
+    def _check_aligned(self, F):
+        if len(F) != len(self):
+            raise ValueError("IntervalsArray objects must have the same "
+                             "number of groups")
+
+
+def _gap_mask(rule, starts, ends, vectorized=False):
+    """ Boolean array of rule applied to the gaps (starts[k], ends[k]);
+        a scalar rule is vectorized with np.vectorize. """
+    if starts.shape[0] == 0:
+        return np.zeros(0, dtype=bool)
+    if not vectorized:
+        rule = np.vectorize(rule, otypes=[bool])
+    mask = np.asarray(rule(starts, ends), dtype=bool)
+    if mask.shape != starts.shape:
+        raise ValueError("rule must return one boolean per gap")
+    return mask
+
+
+def _dense_rank(groups, values):
+    """ Ranks of the (group, value) pairs in lexicographic order, equal
+        pairs sharing a rank; also returns the group and the value of
+        each rank. """
+    order = _lexicographic_order(groups, values)
+    g, v = groups[order], values[order]
+    new = np.ones(g.shape[0], dtype=bool)
+    new[1:] = (g[1:] != g[:-1]) | (v[1:] != v[:-1])
+    ranks = np.empty(g.shape[0], dtype=np.intp)
+    ranks[order] = np.cumsum(new) - 1
+    return ranks, g[new], v[new]
+
+
+def _pair_key(groups, values, bounds):
+    """ Single float key group * span + value ordering (group, value)
+        pairs, with a span that keeps the groups apart.  Rounding can tie
+        two close values of a group but never swaps them, so orders and
+        positions found on these keys must be checked on the pairs. """
+    lo, hi = bounds
+    span = 2 * (hi - lo) + 4
+    return np.clip(values, lo - 1, hi + 1) - lo + groups * span
+
+
+def _finite_bounds(*arrays):
+    arrays = [a for a in arrays if a.shape[0]]
+    lo = min(a.min() for a in arrays) if arrays else 0.
+    hi = max(a.max() for a in arrays) if arrays else 0.
+    if np.isfinite(lo) and np.isfinite(hi):
+        return lo, hi
+    finite = np.concatenate([a[np.isfinite(a)] for a in arrays])
+    if finite.shape[0] == 0:
+        return 0., 0.
+    return finite.min(), finite.max()
+
+
+def _lexicographic_order(groups, values):
+    """ Stable argsort of the (group, value) pairs; much faster than
+        np.lexsort, which is only used if keys happen to tie. """
+    if values.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp)
+    order = _pair_key(groups, values, _finite_bounds(values)).argsort(
+        kind='mergesort')
+    g, v = groups[order], values[order]
+    if np.all((g[1:] > g[:-1]) | ((g[1:] == g[:-1]) & (v[1:] >= v[:-1]))):
+        return order
+    return np.lexsort((values, groups))
+
+
+def _grouped_searchsorted(groups, values, x_groups, x, side='left'):
+    """ searchsorted for (group, value) pairs: where each pair
+        (x_groups, x) goes in the lexicographically sorted pairs
+        (groups, values). """
+    n = values.shape[0]
+    if n == 0:
+        return np.zeros(x.shape[0], dtype=np.intp)
+    bounds = _finite_bounds(values, x)
+    idx = _pair_key(groups, values, bounds).searchsorted(
+        _pair_key(x_groups, x, bounds), side=side)
+
+    def below(i):
+        """ whether pair i is on the left of (x_groups, x) """
+        v = values[i] < x if side == 'left' else values[i] <= x
+        return (groups[i] < x_groups) | ((groups[i] == x_groups) & v)
+
+    # correct the positions for ties of the keys
+    while True:
+        down = (idx > 0) & ~below(np.maximum(idx - 1, 0))
+        up = (idx < n) & below(np.minimum(idx, n - 1))
+        if not (down.any() or up.any()):
+            return idx
+        idx = idx - down + up
+
+
+def _normalize_groups(groups, intervals):
+    """ Sort the intervals of each group and union those that overlap, as
+        Intervals does for a single group; returns the group numbers and
+        intervals of the result, sorted by group. """
+    idx = intervals[:, 1] >= intervals[:, 0]
+    groups, intervals = groups[idx], intervals[idx]
+    n = intervals.shape[0]
+    if n == 0:
+        return groups, intervals
+    same = groups[1:] == groups[:-1]
+    if np.all((groups[1:] > groups[:-1]) |
+              (same & (intervals[1:, 0] >= intervals[:-1, 1]))):
+        # already sorted, at most touching: only merge touching intervals
+        breaks = np.flatnonzero(~same |
+                                (intervals[1:, 0] > intervals[:-1, 1])) + 1
+        first = np.concatenate(([0], breaks))
+        last = np.concatenate((breaks - 1, [n - 1]))
+        return groups[first], np.column_stack((intervals[first, 0],
+                                               intervals[last, 1]))
+    ranks, rank_groups, rank_values = _dense_rank(
+        np.concatenate((groups, groups)),
+        np.concatenate((intervals[:, 0], intervals[:, 1])))
+    lefts, rights = ranks[:n], ranks[n:]
+    order = lefts.argsort(kind='mergesort')
+    lefts, rights = lefts[order], rights[order]
+    # as in Intervals._make_disjoint; since ranks grow with the group
+    # number, a new group always starts a new interval
+    reach = np.maximum.accumulate(rights)
+    breaks = np.flatnonzero(lefts[1:] > reach[:-1]) + 1
+    first = np.concatenate(([0], breaks))
+    last = np.concatenate((breaks - 1, [n - 1]))
+    return (rank_groups[lefts[first]],
+            np.column_stack((rank_values[lefts[first]],
+                             rank_values[reach[last]])))
+
+
+def _overlapping_pairs(A, B, A_groups=None, B_groups=None):
+    """ Given two (M x 2) arrays of sorted, disjoint open intervals,
+        returns the indices i, j of the pairs A[i], B[j] that overlap,
+        sorted by i then j.
+
+        For each interval of A, the intervals of B overlapping it form a
+        contiguous run, found by binary search.  With group numbers
+        (A and B sorted by group first), only intervals of the same
+        group are paired. """
+    if A.shape[0] == 0 or B.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    # B[j] overlaps A[i] iff B[j, 1] > A[i, 0] and B[j, 0] < A[i, 1]
+    if A_groups is None:
+        first = B[:, 1].searchsorted(A[:, 0], side='right')
+        stop = B[:, 0].searchsorted(A[:, 1], side='left')
+    else:
+        first = _grouped_searchsorted(B_groups, B[:, 1], A_groups, A[:, 0],
+                                      side='right')
+        stop = _grouped_searchsorted(B_groups, B[:, 0], A_groups, A[:, 1],
+                                     side='left')
+    counts = np.maximum(stop - first, 0)
+    i = np.repeat(np.arange(A.shape[0]), counts)
+    # j runs from first[i] to stop[i] - 1 within each group
+    offsets = np.cumsum(counts) - counts
+    j = np.arange(counts.sum()) - np.repeat(offsets - first, counts)
+    return i, j
+
+
+def _intersect_open(A, B):
+    """ Given two (M x 2) arrays of sorted, disjoint open intervals,
+        returns the sorted (K x 2) array of their intersections. """
+    i, j = _overlapping_pairs(A, B)
+    return np.column_stack((np.maximum(A[i, 0], B[j, 0]),
+                            np.minimum(A[i, 1], B[j, 1])))
+
+
 def intervals_from_binary(bin_array, times):
     """
     Given a one dimensional bin_array of 0s and 1s,
     returns a Intervals object of times corresponding to consecutives 1s
     """
-    F = Intervals()
-    idx = 0
-    while idx < bin_array.shape[0]:
-        curr_bit = bin_array[idx]
-        if curr_bit == 0:
-            idx += 1
-        else:
-            AS_idx = idx + 1
-            start_idx = idx
-            while AS_idx < bin_array.shape[0] and bin_array[AS_idx] == 1:
-                AS_idx += 1
-            F = F.union(Intervals([times[start_idx], times[AS_idx - 1]]))
-            idx = AS_idx
-    return F
+    bits = np.concatenate(([0], np.asarray(bin_array) != 0, [0]))
+    # +1 where a run of 1s starts, -1 just after it ends
+    edges = np.diff(bits.astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1) - 1
+    times = np.asarray(times)
+    return Intervals(np.column_stack((times[starts], times[stops])))
 
 
 def binary_from_intervals(intervals, length=None):
     """ From an intervals object produce a binary sequence of size length """
     if length is None:
         length = int(intervals.intervals[-1, 1] - intervals.intervals[0, 0])
-    binary = np.zeros(length)
     start = intervals.intervals[0, 0]
     end = intervals.intervals[-1, 1]
-    arr = np.linspace(start, end, length)
-    for c, time in enumerate(arr):
-        if intervals.contains(time):
-            binary[c] = 1
-    return binary
+    if end < start:
+        # a single reversed interval, which contains no point
+        return np.zeros(length)
+    # the points of np.linspace(start, end, length) inside each [a, b]
+    # form a run lo:hi; the disjoint intervals cut the grid into
+    # alternating runs of 0s and 1s
+    bounds = np.empty(2 * intervals.num() + 2, dtype=np.intp)
+    bounds[0], bounds[-1] = 0, length
+    bounds[1:-1:2] = _linspace_searchsorted(
+        start, end, length, intervals.intervals[:, 0], side='left')
+    bounds[2:-1:2] = _linspace_searchsorted(
+        start, end, length, intervals.intervals[:, 1], side='right')
+    values = np.zeros(bounds.shape[0] - 1)
+    values[1::2] = 1
+    return np.repeat(values, np.diff(bounds))
+
+
+def _linspace_searchsorted(start, end, length, x, side='left'):
+    """ Same as np.linspace(start, end, length).searchsorted(x, side),
+        without building the grid: the index is computed from the grid
+        step and then corrected for rounding against the exact grid
+        values i * step + start that np.linspace produces. """
+    x = np.asarray(x, dtype=np.double)
+    if length < 2 or end <= start:
+        return np.linspace(start, end, length).searchsorted(x, side=side)
+    step = (end - start) / (length - 1)
+
+    def below(i):
+        """ whether grid point i is on the left of x """
+        grid = np.where(i == length - 1, end, i * step + start)
+        return grid < x if side == 'left' else grid <= x
+
+    guess = np.clip(np.ceil((x - start) / step), 0, length)
+    idx = np.nan_to_num(guess).astype(np.intp)
+    # rounding moves the guess by one point at most; build the grid if
+    # a few corrections do not settle it
+    for _ in range(4):
+        down = (idx > 0) & ~below(np.maximum(idx - 1, 0))
+        up = (idx < length) & below(np.minimum(idx, length - 1))
+        if not (down.any() or up.any()):
+            return idx
+        idx = idx - down + up
+    return np.linspace(start, end, length).searchsorted(x, side=side)
 
 
 def timestamps_to_interval(array, eps=.01):
@@ -12,9 +12,10 @@ def path_index(movement, stop_threshold, min_path_length):
 
     Parameters
     ----------
-    movement : pandas.DataFrame
+    movement : pandas.DataFrame or MouseDay
         CT, CX, CY coordinates and homebase status
         for the unique combination of strain, mouse and day
+        (only t is read)
     stop_threshold : float
         positive number indicating the path cutoff criteria
         if the time difference between two observations is
@@ -44,7 +45,7 @@ def path_index(movement, stop_threshold, min_path_length):
         raise TypeError("min_path_length needs to be integer")
 
     # Pull out time variable
-    T = movement['t'].ravel()
+    T = np.ravel(movement['t'])
     # Calculate time differences
     TD = np.diff(T)
     path = []
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from mousestyles.data import MouseDay
+
 
 def clean_movements(movements, keep_index=False):
     r"""
@@ -14,7 +16,7 @@ def clean_movements(movements, keep_index=False):
     ----------
     movements : list
         each element is pandas.DataFrame containing
-        CT, CX, CY coordinates.
+        CT, CX, CY coordinates, or a MouseDay.
         Should have length greater than 1.
 
     keep_index : boolean
@@ -45,6 +47,8 @@ def clean_movements(movements, keep_index=False):
 
     if not isinstance(keep_index, bool):
         raise TypeError("keep_index must be bool")
+    movements = [movement.to_frame() if isinstance(movement, MouseDay)
+                 else movement for movement in movements]
 
     def testing_input_movement(one_movement):
         # test for each element of `movements`
@@ -1,5 +1,7 @@
 from __future__ import print_function, absolute_import, division
 
+import numpy as np
+
 
 def filter_paths(movement, paths, time_threshold):
     r"""
@@ -9,9 +11,10 @@ def filter_paths(movement, paths, time_threshold):
 
     Parameters
     ----------
-    movement : pandas.DataFrame
+    movement : pandas.DataFrame or MouseDay
         CT, CX, CY coordinates and homebase status
         for the unique combination of strain, mouse and day
+        (only t is read)
     paths: list
         a list containing the indices for all paths
     time_threshold : float
@@ -44,7 +47,7 @@ def filter_paths(movement, paths, time_threshold):
     # Run through each path and check whether the time spending
     # on the path is equal to or larger than the time threshold
     for path in paths:
-        start_time, end_time = T[path].ravel()
+        start_time, end_time = np.ravel(T[path])
         if (end_time - start_time) >= time_threshold:
             pass_paths.append(path)
 
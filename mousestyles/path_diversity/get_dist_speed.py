@@ -10,7 +10,7 @@ def get_dist_speed(movement, start, end, return_array=True):
 
     Parameters
     ----------
-    movement : pandas.DataFrame
+    movement : pandas.DataFrame or MouseDay
         CT, CX, CY coordinates and homebase status for the unique
         combination of strain, mouse, and day
 
@@ -60,11 +60,11 @@ def get_dist_speed(movement, start, end, return_array=True):
     if start == end:
         return(0, 0)
 
-    x = movement['x'][start:(end+1)].ravel()
-    y = movement['y'][start:(end+1)].ravel()
+    x = np.ravel(movement['x'][start:(end+1)])
+    y = np.ravel(movement['y'][start:(end+1)])
 
     if return_array:
-        t = movement['t'][start:(end+1)].ravel()
+        t = np.ravel(movement['t'][start:(end+1)])
         time = np.diff(t)
         dist = np.sqrt((x[1:] - x[:-1])**2 + (y[1:] - y[:-1])**2).tolist()
         speed = (dist / time).tolist()
@@ -1,9 +1,11 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 
+import numpy as np
 import pandas
+from mousestyles.data import derived
 from mousestyles.est_power_param import (fit_powerlaw, fit_exponential,
-                                         fit_dist_all)
+                                         fit_dist_all, getdistance)
 
 
 def test_fit_powerlaw():
@@ -16,3 +18,16 @@ def test_fit_exponential():
 
 def test_fit_dist_all():
     assert type(fit_dist_all()) is pandas.core.frame.DataFrame
+
+
+def test_getdistance_derived(tmpdir, monkeypatch):
+    # use an empty shared store of derived columns
+    monkeypatch.setattr(derived, "DERIVED_DIR", str(tmpdir))
+    monkeypatch.setattr(derived, "_stores", {})
+    dist = getdistance(0, 0, 0)
+    assert tmpdir.listdir() == []
+    assert derived.precompute_derived(["dist"], [(0, 0, 0)]) == 1
+    np.testing.assert_array_equal(getdistance(0, 0, 0), dist)
+    # the distances are read from the store
+    derived.open_derived().save("dist", 0, 0, 0, np.array([.5, 2., 3.]))
+    np.testing.assert_array_equal(getdistance(0, 0, 0), [2., 3.])
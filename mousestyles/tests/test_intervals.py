@@ -2,10 +2,160 @@ from __future__ import (absolute_import, division, print_function,
                         unicode_literals)
 
 import mousestyles.data as data
-from mousestyles.intervals import Intervals
+from mousestyles.intervals import (Intervals, IntervalsArray,
+                                   intervals_from_binary,
+                                   binary_from_intervals)
+import numpy as np
+import pandas as pd
+import pytest
 
 
 def test_intervals():
     # This is a place holder.  Not sure this is correct.
     all_features = data.load_all_features()
     assert Intervals(all_features).measure() == 11.0
+
+
+def test_contains_many():
+    F = Intervals([[1, 2], [4, 4], [6, 8]])
+    x = [0, 1, 1.5, 2, 3, 4, 5, 6, 8, 9]
+    expected = [F.contains(v) for v in x]
+    assert list(F.contains_many(x)) == expected
+    assert not Intervals().contains_many(x).any()
+
+
+def test_make_disjoint():
+    F = Intervals([[5, 6], [1, 3], [2, 4], [4, 4.5], [7, 7], [8, 7]])
+    assert F.intervals.tolist() == [[1, 4.5], [5, 6], [7, 7]]
+    F = Intervals([[0, 10], [1, 2], [3, 4], [10, 11]])
+    assert F.intervals.tolist() == [[0, 11]]
+    assert Intervals([[2, 1], [3, 0]]).is_empty()
+
+
+def test_set_operations():
+    A = Intervals([[0, 2], [4, 6], [8, 8]])
+    B = Intervals([[1, 5], [6, 7], [8, 9]])
+    assert (A + B).intervals.tolist() == [[0, 7], [8, 9]]
+    # touching intervals and point intervals have no interior in common
+    assert (A * B).intervals.tolist() == [[1, 2], [4, 5]]
+    assert (A - B).intervals.tolist() == [[0, 1], [5, 6]]
+    assert (B - A).intervals.tolist() == [[2, 4], [6, 7], [8, 9]]
+    assert A.symmetric_difference(B).intervals.tolist() == \
+        [[0, 1], [2, 4], [5, 7], [8, 9]]
+    # the set operations agree with their complement-based definitions
+    assert (A * B).intervals.tolist() == (~(~A + ~B)).intervals.tolist()
+    assert (A - B).intervals.tolist() == (A * ~B).intervals.tolist()
+    assert (A * Intervals()).is_empty()
+    assert (Intervals() - A).is_empty()
+
+
+def test_connect_gaps_by_rule():
+    F = Intervals([[0, 1], [2, 3], [6, 7], [7.5, 9], [20, 21]])
+
+    def rule(start, end):
+        return end - start < 2
+    expected = [[0, 3], [6, 9], [20, 21]]
+    assert F.connect_gaps_by_rule(rule).intervals.tolist() == expected
+    assert F.connect_gaps_by_rule(rule, vectorized=True).intervals.tolist() \
+        == expected
+    # a scalar rule which cannot take arrays
+    F = F.connect_gaps_by_rule(lambda start, end: 3 if start < 2 else 0)
+    assert F.intervals.tolist() == [[0, 3], [6, 7], [7.5, 9], [20, 21]]
+    assert Intervals().connect_gaps_by_rule(rule).is_empty()
+    with pytest.raises(ValueError):
+        F.connect_gaps_by_rule(lambda start, end: True, vectorized=True)
+
+    F = IntervalsArray.from_list([[[0, 1], [2, 3]], [], [[4, 5], [9, 10]]])
+    F = F.connect_gaps_by_rule(rule, vectorized=True)
+    assert [x.intervals.tolist() for x in F] == \
+        [[[0, 3]], [], [[4, 5], [9, 10]]]
+
+
+def test_subordinate_to_array():
+    F = Intervals([[0, 1], [3, 5], [8, 8], [10, 12]])
+    G = F.subordinate_to_array([0.5, 5, 8, 13])
+    # a point at the right end only counts for point intervals
+    assert G.intervals.tolist() == [[0, 1], [8, 8]]
+    assert F.subordinate_to_array([]).is_empty()
+    assert Intervals().subordinate_to_array([1, 2]).is_empty()
+
+
+def test_intervals_index():
+    F = Intervals([[0, 1], [3, 5], [8, 8]])
+    index = F.index()
+    np.testing.assert_array_equal(index.stab([-1, 0, 2, 4, 5, 8, 9]),
+                                  [-1, 0, -1, 1, 1, 2, -1])
+    first, stop = index.overlap_range([1, 1.5, 6], [3, 2, 10])
+    np.testing.assert_array_equal(first, [0, 1, 2])
+    np.testing.assert_array_equal(stop, [2, 1, 3])
+    queries, ids = index.overlap_pairs([1, 1.5, 6], [3, 2, 10])
+    np.testing.assert_array_equal(queries, [0, 0, 2])
+    np.testing.assert_array_equal(ids, [0, 1, 2])
+    ids, distances = index.nearest([-1, 2, 4, 6.5, 7, 20])
+    np.testing.assert_array_equal(ids, [0, 0, 1, 1, 2, 2])
+    np.testing.assert_array_equal(distances, [1, 1, 0, 1.5, 1, 12])
+    # the index is a snapshot of F
+    F.trim(1.5)
+    assert len(index) == 3
+    assert index.intervals.flags.writeable is False
+    assert Intervals().index().stab([0]).tolist() == [-1]
+    assert F.intersect_with_interval(4, 10).intervals.tolist() == [[3, 5]]
+    assert F.intersect_with_interval(6, 10).is_empty()
+
+
+def test_intervals_from_binary():
+    times = np.arange(10.)
+    F = intervals_from_binary(np.array([1, 1, 0, 0, 1, 0, 1, 1, 1, 0]), times)
+    assert F.intervals.tolist() == [[0, 1], [4, 4], [6, 8]]
+    assert intervals_from_binary(np.zeros(10), times).is_empty()
+    F = intervals_from_binary(np.ones(10), times)
+    assert F.intervals.tolist() == [[0, 9]]
+
+
+def test_binary_from_intervals():
+    F = Intervals([[0, 1], [4, 4], [6, 9]])
+    binary = binary_from_intervals(F)
+    np.testing.assert_array_equal(binary, [1, 0, 0, 0, 0, 0, 1, 1, 1])
+    binary = binary_from_intervals(F, length=10)
+    expected = [F.contains(t) for t in np.linspace(0, 9, 10)]
+    np.testing.assert_array_equal(binary, expected)
+    # fewer than 2 points
+    np.testing.assert_array_equal(binary_from_intervals(F, length=1), [1])
+    assert binary_from_intervals(F, length=0).shape == (0,)
+    # a reversed interval contains no point
+    binary = binary_from_intervals(Intervals([[14., 13.]]), 41)
+    np.testing.assert_array_equal(binary, np.zeros(41))
+
+
+def test_intervals_array():
+    items = [[[5, 6], [1, 3], [2, 4]], [], [[0, 1], [1, 2], [7, 8]],
+             [[-np.inf, 0], [3, np.inf]]]
+    other = [[[3, 5.5]], [[0, 1]], [[0.5, 7.5]], [[-1, 4]]]
+    F = IntervalsArray.from_list(items)
+    G = IntervalsArray.from_list(other)
+    singles = [Intervals(item) for item in items]
+    assert len(F) == 4
+    np.testing.assert_array_equal(F.num(), [x.num() for x in singles])
+    np.testing.assert_array_equal(F.measure(),
+                                  [x.measure() for x in singles])
+
+    # each group gives the same result as its Intervals object
+    def check(result, expected):
+        assert [x.intervals.tolist() for x in result] == \
+            [x.intervals.tolist() for x in expected]
+    check(F, singles)
+    check(~F, [~x for x in singles])
+    check(F * G, [x * Intervals(y) for x, y in zip(singles, other)])
+    check(F + G, [x + Intervals(y) for x, y in zip(singles, other)])
+    check(F.ISs(2), [x.ISs(2) for x in singles])
+    check(IntervalsArray.from_list(items).trim(1.5),
+          [Intervals(item).trim(1.5) for item in items])
+    with pytest.raises(ValueError):
+        F * IntervalsArray.from_list(other[:2])
+
+    frame = pd.DataFrame({"strain": [1, 0, 0, 1], "mouse": [0, 0, 0, 0],
+                          "day": [0, 1, 1, 0], "start": [4., 0., 2., 1.],
+                          "stop": [5., 1., 3., 2.]})
+    F = IntervalsArray.from_frame(frame)
+    assert F.keys.tolist() == [[0, 0, 1], [1, 0, 0]]
+    assert F[1].intervals.tolist() == [[1, 2], [4, 5]]
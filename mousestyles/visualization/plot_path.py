@@ -1,6 +1,8 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from mousestyles.data import MouseDay
+
 
 def plot_path(movement, paths, title='example plot of path', alpha=.1,
               linewidth=1., xlim=[-16.24, 3.76], ylim=[0.9, 43.5]):
@@ -9,7 +11,7 @@ def plot_path(movement, paths, title='example plot of path', alpha=.1,
 
     Parameters
     ----------
-    movement : pandas.DataFrame
+    movement : pandas.DataFrame or MouseDay
         CX, CY coordinates. Must have length greater than 1.
 
     paths: list
@@ -40,6 +42,9 @@ def plot_path(movement, paths, title='example plot of path', alpha=.1,
     >>> plot_path(movement, sep)
     """
 
+    if isinstance(movement, MouseDay):
+        movement = movement.to_frame(["x", "y"])
+
     if not isinstance(movement, pd.core.frame.DataFrame):
         raise TypeError("movement must be pandas DataFrame")
 